@@ -1,5 +1,5 @@
 import os
-from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, session, send_from_directory
+from flask import Flask, render_template, request, redirect, url_for, jsonify, flash, session, send_from_directory, Response, stream_with_context
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed, FileRequired
@@ -9,6 +9,11 @@ from wtforms.validators import DataRequired, Email, Length, NumberRange
 from werkzeug.utils import secure_filename
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
+from uploads import UploadRequest, UploadRejected, load_upload_form, streamed_upload
+from storage import create_storage
+from assets import assets
+from fragment_cache import fragment_cache
+from search import SEARCH_TARGETS, SearchUnavailable, create_search_index, search
 import uuid
 from datetime import datetime
 import json
@@ -19,6 +24,7 @@ load_dotenv()
 
 # Initialize Flask app
 app = Flask(__name__)
+app.request_class = UploadRequest
 
 # Secret key (use environment variable in production)
 app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', '3bddf28f82ab46379585757481788c6c0a2876c1051f4e94')
@@ -34,17 +40,64 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
 # File upload settings
 app.config['UPLOAD_FOLDER'] = os.path.join(os.getcwd(), 'uploads')
-app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB max file size
+# Per-type limits are enforced while the upload streams in (streamed_upload endpoints)
+app.config['UPLOAD_SIZE_LIMITS'] = {
+    'document': 10 * 1024 * 1024,  # 10MB
+    'image': 10 * 1024 * 1024,  # 10MB
+    'audio': 100 * 1024 * 1024,  # 100MB
+    'video': 500 * 1024 * 1024  # 500MB
+}
+# Every other request; streamed_upload endpoints raise it to fit the largest upload
+app.config['MAX_CONTENT_LENGTH'] = 10 * 1024 * 1024  # 10MB max request size
+
+# Media storage: 'local' (UPLOAD_FOLDER on this node) or 's3' (any S3-compatible service, e.g. MinIO;
+# needs the s3 extra)
+app.config['STORAGE_BACKEND'] = os.getenv('STORAGE_BACKEND', 'local')
+app.config['S3_ENDPOINT_URL'] = os.getenv('S3_ENDPOINT_URL')
+app.config['S3_BUCKET'] = os.getenv('S3_BUCKET', 'seedsowers-media')
+app.config['S3_ACCESS_KEY'] = os.getenv('S3_ACCESS_KEY')
+app.config['S3_SECRET_KEY'] = os.getenv('S3_SECRET_KEY')
+app.config['S3_REGION'] = os.getenv('S3_REGION', 'us-east-1')
+app.config['S3_MAX_POOL_CONNECTIONS'] = int(os.getenv('S3_MAX_POOL_CONNECTIONS', 20))
+app.config['S3_URL_EXPIRY'] = 3600  # presigned download links, in seconds
+
+# Rendered template fragments: per-process LRU, plus an optional shared Redis tier
+app.config['FRAGMENT_CACHE_SIZE'] = 2048
+app.config['FRAGMENT_CACHE_URL'] = os.getenv('FRAGMENT_CACHE_URL')
+# Part of every fragment key; defaults to a hash of the templates
+app.config['FRAGMENT_CACHE_VERSION'] = os.getenv('RELEASE_VERSION')
+
+SUBMISSION_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt'}
+COURSE_FILE_EXTENSIONS = {
+    'pdf', 'doc', 'docx', 'ppt', 'pptx', 'txt',  # Documents
+    'mp3', 'wav', 'ogg', 'aac', 'm4a',  # Audio
+    'mp4', 'avi', 'mov', 'mkv', 'webm',  # Video
+    'jpg', 'jpeg', 'png', 'gif', 'bmp'  # Images
+}
+
+# Largest batch accepted by the bulk review endpoint
+BULK_REVIEW_LIMIT = 1000
 
 # Import models and initialize database
-from models import db, User, Course, CourseFile, UserProgress, CourseSubmission
+from models import db, User, Course, CourseFile, UserProgress, CourseSubmission, ArchivedSubmission
+from serializers import AppJSONProvider, select, rows, one_or_404
+from events import broker, format_sse
+from archive import completed_submissions, create_partitions, progress_rows, submission_history, submission_rows
+from completion import clear_file, completed_positions, completion_counts, course_completion, index_course_files, mark_complete, next_bit_index
+from sync import advance_cursors, cursor_value, sync_delta, sync_summary
+import queue
 
 # Initialize extensions
 db.init_app(app)
+app.json = AppJSONProvider(app)
+broker.init_app(app)
+assets.init_app(app)
+fragment_cache.init_app(app)
 migrate = Migrate(app, db)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
+storage = create_storage(app.config)
 
 # Create upload directories with organized structure
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
@@ -106,6 +159,7 @@ def register():
         )
         
         db.session.add(user)
+        broker.publish('user_registered', stats={'total_users': 1})
         db.session.commit()
         
         flash('Registration successful! Please log in.', 'success')
@@ -123,30 +177,26 @@ def logout():
 @login_required
 def dashboard():
     courses = Course.query.filter_by(is_active=True).order_by(Course.order).all()
-    user_progress = UserProgress.query.filter_by(user_id=current_user.id).all()
-    completed_courses = CourseSubmission.query.filter_by(
-        user_id=current_user.id, 
-        status='approved'
-    ).all()
+    recent_progress = UserProgress.query.filter_by(user_id=current_user.id).order_by(
+        UserProgress.completed_at.desc()
+    ).limit(5).all()[::-1]
+    completed_courses = completed_submissions(current_user.id)
     
     return render_template('dashboard.html', 
                          courses=courses, 
-                         user_progress=user_progress,
+                         completion_counts=completion_counts(current_user.id),
+                         recent_progress=recent_progress,
                          completed_courses=completed_courses)
 
 @app.route('/courses')
 @login_required
 def courses():
     courses = Course.query.filter_by(is_active=True).order_by(Course.order).all()
-    user_progress = UserProgress.query.filter_by(user_id=current_user.id).all()
-    completed_courses = CourseSubmission.query.filter_by(
-        user_id=current_user.id, 
-        status='approved'
-    ).all()
+    completed_courses = completed_submissions(current_user.id)
     
     return render_template('courses.html', 
                          courses=courses, 
-                         user_progress=user_progress,
+                         completion_counts=completion_counts(current_user.id),
                          completed_courses=completed_courses)
 
 @app.route('/course/<course_id>')
@@ -154,20 +204,21 @@ def courses():
 def course_detail(course_id):
     course = Course.query.get_or_404(course_id)
     files = CourseFile.query.filter_by(course_id=course_id).order_by(CourseFile.order).all()
-    user_progress = UserProgress.query.filter_by(
-        user_id=current_user.id, 
-        course_id=course_id
-    ).all()
+    if any(f.bit_index is None for f in files):
+        # Files added before completion bitmaps - indexed once, on first view
+        index_course_files(course_id)
+        db.session.commit()
+    completed_bits = completed_positions(current_user.id, course_id)
     
     return render_template('course_detail.html', 
                          course=course, 
                          files=files, 
-                         user_progress=user_progress)
+                         completed_bits=completed_bits)
 
 @app.route('/submissions')
 @login_required
 def submissions():
-    user_submissions = CourseSubmission.query.filter_by(user_id=current_user.id).all()
+    user_submissions = submission_history(current_user.id)
     courses = Course.query.filter_by(is_active=True).order_by(Course.order).all()
     
     return render_template('submissions.html', 
@@ -185,7 +236,7 @@ def admin():
     total_users = User.query.count()
     total_courses = Course.query.count()
     pending_submissions = CourseSubmission.query.filter_by(status='pending').count()
-    total_submissions = CourseSubmission.query.count()
+    total_submissions = CourseSubmission.query.count() + ArchivedSubmission.query.count()
     
     stats = {
         'total_users': total_users,
@@ -207,14 +258,19 @@ def mark_file_complete():
     if not course_id or not file_id:
         return jsonify({'error': 'Course ID and File ID are required'}), 400
     
-    # Check if already completed
-    existing = UserProgress.query.filter_by(
-        user_id=current_user.id,
-        course_id=course_id,
-        file_id=file_id
-    ).first()
-    
-    if existing:
+    course_file = CourseFile.query.filter_by(id=file_id, course_id=course_id).first()
+    if not course_file:
+        return jsonify({'error': 'File not found'}), 404
+    if course_file.bit_index is None:
+        # Files added before completion bitmaps get positions on first use; the
+        # refresh picks up one assigned by a request that held the course lock first
+        index_course_files(course_id)
+        db.session.refresh(course_file)
+    
+    # Check if already completed - sets the file's bit in the user's bitmap if not
+    if not mark_complete(current_user.id, course_id, course_file.bit_index):
+        # Keeps a bit index or bitmap created above
+        db.session.commit()
         return jsonify({'message': 'Already completed'}), 200
     
     # Mark as completed
@@ -233,37 +289,38 @@ def mark_file_complete():
 @app.route('/api/progress')
 @login_required
 def get_user_progress():
-    progress = UserProgress.query.filter_by(user_id=current_user.id).all()
-    return jsonify([{
-        'id': p.id,
-        'course_id': p.course_id,
-        'file_id': p.file_id,
-        'completed_at': p.completed_at.isoformat()
-    } for p in progress])
+    if request.args.get('summary') or 'since' in request.args:
+        return sync_response('progress')
+    
+    return jsonify(progress_rows(current_user.id))
 
 @app.route('/api/progress/completed-courses')
 @login_required
 def get_completed_courses():
     # Get approved submissions (completed courses)
-    completed = CourseSubmission.query.filter_by(
-        user_id=current_user.id,
-        status='approved'
-    ).all()
+    completed = completed_submissions(current_user.id)
     
     return jsonify([s.course_id for s in completed])
 
 # Course submission API
 @app.route('/api/submit-report', methods=['POST'])
 @login_required
+@streamed_upload(SUBMISSION_EXTENSIONS)
 def submit_course_report():
-    course_id = request.form.get('course_id')
-    comments = request.form.get('comments', '')
+    try:
+        form, files = load_upload_form()
+    except UploadRejected as e:
+        flash(e.message, 'error')
+        return redirect(url_for('submissions'))
+    
+    course_id = form.get('course_id')
+    comments = form.get('comments', '')
     
-    if 'submission_file' not in request.files:
+    if 'submission_file' not in files:
         flash('No file uploaded', 'error')
         return redirect(url_for('submissions'))
     
-    file = request.files['submission_file']
+    file = files['submission_file']
     if file.filename == '':
         flash('No file selected', 'error')
         return redirect(url_for('submissions'))
@@ -272,11 +329,13 @@ def submit_course_report():
         filename = secure_filename(file.filename)
         # Add timestamp to avoid conflicts
         filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}"
-        file_path = os.path.join(app.config['UPLOAD_FOLDER'], 'submissions', filename)
+        file_path = f"submissions/{filename}"
         
-        # Ensure submissions directory exists
-        os.makedirs(os.path.dirname(file_path), exist_ok=True)
-        file.save(file_path)
+        try:
+            file.stream.commit(storage, file_path, file.mimetype)
+        except UploadRejected as e:
+            flash(e.message, 'error')
+            return redirect(url_for('submissions'))
         
         # Create submission record
         submission = CourseSubmission(
@@ -285,11 +344,18 @@ def submit_course_report():
             course_id=course_id,
             file_path=file_path,
             file_name=filename,
-            file_size=os.path.getsize(file_path),
+            file_size=file.stream.size,
+            checksum=file.stream.checksum,
             comments=comments
         )
         
         db.session.add(submission)
+        # Admin pages fetch the new row by id - comments are too long for an event
+        broker.publish(
+            'submission_created',
+            {'id': submission.id},
+            stats={'pending_submissions': 1, 'total_submissions': 1}
+        )
         db.session.commit()
         
         flash('Report submitted successfully for review', 'success')
@@ -299,8 +365,7 @@ def submit_course_report():
     return redirect(url_for('submissions'))
 
 def allowed_file(filename):
-    ALLOWED_EXTENSIONS = {'pdf', 'doc', 'docx', 'txt'}
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in SUBMISSION_EXTENSIONS
 
 # Admin API Routes
 @app.route('/api/admin/stats')
@@ -313,7 +378,7 @@ def admin_stats():
         'total_users': User.query.count(),
         'total_courses': Course.query.count(),
         'pending_submissions': CourseSubmission.query.filter_by(status='pending').count(),
-        'total_submissions': CourseSubmission.query.count()
+        'total_submissions': CourseSubmission.query.count() + ArchivedSubmission.query.count()
     }
     
     return jsonify(stats)
@@ -324,16 +389,8 @@ def get_admin_courses():
     if current_user.role not in ['admin', 'super_admin']:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    courses = Course.query.order_by(Course.order).all()
-    return jsonify([{
-        'id': c.id,
-        'title': c.title,
-        'description': c.description,
-        'duration': c.duration,
-        'order': c.order,
-        'is_active': c.is_active,
-        'created_at': c.created_at.isoformat()
-    } for c in courses])
+    courses = select('course_admin').order_by(Course.order)
+    return jsonify(rows(courses))
 
 @app.route('/api/admin/courses', methods=['POST'])
 @login_required
@@ -353,46 +410,50 @@ def create_course():
     )
     
     db.session.add(course)
+    broker.publish('course_created', {'id': course.id}, stats={'total_courses': 1})
     db.session.commit()
     
     return jsonify({'message': 'Course created successfully', 'id': course.id}), 201
 
 @app.route('/api/admin/courses/<course_id>/files', methods=['POST'])
 @login_required
+@streamed_upload(COURSE_FILE_EXTENSIONS, roles=['admin', 'super_admin'])
 def upload_course_file(course_id):
     if current_user.role not in ['admin', 'super_admin']:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    if 'file' not in request.files:
+    try:
+        form, files = load_upload_form()
+    except UploadRejected as e:
+        return jsonify({'error': e.message}), e.status_code
+    
+    if 'file' not in files:
         return jsonify({'error': 'No file uploaded'}), 400
     
-    file = request.files['file']
+    file = files['file']
     if file.filename == '':
         return jsonify({'error': 'No file selected'}), 400
     
-    title = request.form.get('title')
-    description = request.form.get('description', '')
-    file_type = request.form.get('fileType')
-    order = int(request.form.get('order', 1))
-    duration = request.form.get('duration', '')
+    title = form.get('title')
+    description = form.get('description', '')
+    file_type = form.get('fileType')
+    order = int(form.get('order', 1))
+    duration = form.get('duration', '')
     
     if file and allowed_course_file(file.filename):
         # Get course details for organized folder structure
         course = Course.query.get_or_404(course_id)
         
-        # Create organized folder structure: course-files/course-id/file-type/
-        course_folder = os.path.join(app.config['UPLOAD_FOLDER'], 'course-files', course_id)
-        type_folder = os.path.join(course_folder, file_type)
-        
-        # Ensure organized directory structure exists
-        os.makedirs(type_folder, exist_ok=True)
-        
         filename = secure_filename(file.filename)
         # Add timestamp to avoid conflicts
         filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{filename}"
-        file_path = os.path.join(type_folder, filename)
+        # Organized structure: course-files/course-id/file-type/
+        file_path = f"course-files/{course_id}/{file_type}/{filename}"
         
-        file.save(file_path)
+        try:
+            file.stream.commit(storage, file_path, file.mimetype)
+        except UploadRejected as e:
+            return jsonify({'error': e.message}), e.status_code
         
         # Create course file record
         course_file = CourseFile(
@@ -402,9 +463,11 @@ def upload_course_file(course_id):
             description=description,
             file_type=file_type,
             file_path=file_path,
-            file_size=os.path.getsize(file_path),
+            file_size=file.stream.size,
+            checksum=file.stream.checksum,
             duration=duration,
-            order=order
+            order=order,
+            bit_index=next_bit_index(course_id)
         )
         
         db.session.add(course_file)
@@ -413,19 +476,13 @@ def upload_course_file(course_id):
         return jsonify({
             'message': 'File uploaded successfully', 
             'id': course_file.id,
-            'organized_path': f"course-files/{course_id}/{file_type}/{filename}"
+            'organized_path': file_path
         }), 201
     else:
         return jsonify({'error': 'Invalid file type'}), 400
 
 def allowed_course_file(filename):
-    ALLOWED_EXTENSIONS = {
-        'pdf', 'doc', 'docx', 'ppt', 'pptx', 'txt',  # Documents
-        'mp3', 'wav', 'ogg', 'aac', 'm4a',  # Audio
-        'mp4', 'avi', 'mov', 'mkv', 'webm',  # Video
-        'jpg', 'jpeg', 'png', 'gif', 'bmp'  # Images
-    }
-    return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in COURSE_FILE_EXTENSIONS
 
 def get_file_type_from_extension(filename):
     """Automatically determine file type based on extension"""
@@ -448,16 +505,8 @@ def get_admin_users():
     if current_user.role not in ['admin', 'super_admin']:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    users = User.query.all()
-    return jsonify([{
-        'id': u.id,
-        'email': u.email,
-        'first_name': u.first_name,
-        'last_name': u.last_name,
-        'role': u.role,
-        'is_active': u.is_active,
-        'created_at': u.created_at.isoformat()
-    } for u in users])
+    users = select('user_admin')
+    return jsonify(rows(users))
 
 @app.route('/api/admin/users/<user_id>/status', methods=['PUT'])
 @login_required
@@ -482,20 +531,27 @@ def get_pending_submissions():
     if current_user.role not in ['admin', 'super_admin']:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    submissions = db.session.query(CourseSubmission, User, Course).join(
+    submissions = select('pending_submission').select_from(CourseSubmission).join(
         User, CourseSubmission.user_id == User.id
     ).join(
         Course, CourseSubmission.course_id == Course.id
-    ).filter(CourseSubmission.status == 'pending').all()
+    ).filter(CourseSubmission.status == 'pending')
     
-    return jsonify([{
-        'id': s.CourseSubmission.id,
-        'file_name': s.CourseSubmission.file_name,
-        'course_title': s.Course.title,
-        'student_name': f"{s.User.first_name} {s.User.last_name}",
-        'submitted_at': s.CourseSubmission.submitted_at.isoformat(),
-        'comments': s.CourseSubmission.comments
-    } for s in submissions])
+    return jsonify(rows(submissions))
+
+@app.route('/api/admin/submissions/<submission_id>')
+@login_required
+def get_pending_submission(submission_id):
+    if current_user.role not in ['admin', 'super_admin']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    submission = select('pending_submission').select_from(CourseSubmission).join(
+        User, CourseSubmission.user_id == User.id
+    ).join(
+        Course, CourseSubmission.course_id == Course.id
+    ).filter(CourseSubmission.id == submission_id, CourseSubmission.status == 'pending')
+    
+    return jsonify(one_or_404(submission))
 
 @app.route('/api/admin/submissions/<submission_id>/review', methods=['PUT'])
 @login_required
@@ -508,93 +564,199 @@ def review_submission(submission_id):
     review_comments = data.get('review_comments', '')
     
     submission = CourseSubmission.query.get_or_404(submission_id)
+    was_pending = submission.status == 'pending'
     submission.status = status
     submission.review_comments = review_comments
     submission.reviewed_by = current_user.id
     submission.reviewed_at = datetime.utcnow()
     
+    broker.publish(
+        'submission_reviewed',
+        {'id': submission.id, 'status': status},
+        stats={'pending_submissions': int(status == 'pending') - int(was_pending)}
+    )
     db.session.commit()
     
     return jsonify({'message': f'Submission {status} successfully'})
 
+@app.route('/api/admin/submissions/review', methods=['PUT'])
+@login_required
+def bulk_review_submissions():
+    """Approve or reject many pending submissions in one transaction"""
+    if current_user.role not in ['admin', 'super_admin']:
+        return jsonify({'error': 'Unauthorized'}), 403
+
+    data = request.get_json() or {}
+    status = data.get('status')
+    review_comments = data.get('review_comments', '')
+    submission_ids = data.get('submission_ids')
+
+    if status not in ['approved', 'rejected']:
+        return jsonify({'error': 'Status must be approved or rejected'}), 400
+    if not isinstance(submission_ids, list) or not submission_ids:
+        return jsonify({'error': 'submission_ids must be a non-empty list'}), 400
+    if len(submission_ids) > BULK_REVIEW_LIMIT:
+        return jsonify({'error': f'At most {BULK_REVIEW_LIMIT} submissions per request'}), 400
+
+    submission_ids = list(dict.fromkeys(str(i) for i in submission_ids))
+
+    # Lock the rows so a concurrent single review can't change them mid-batch
+    found = db.session.query(
+        CourseSubmission.id, CourseSubmission.status, CourseSubmission.user_id
+    ).filter(CourseSubmission.id.in_(submission_ids)).with_for_update().all()
+    current = {row.id: row.status for row in found}
+    reviewed = [i for i in submission_ids if current.get(i) == 'pending']
+
+    if reviewed:
+        # Students' delta sync picks the decisions up through their cursors
+        advance_cursors(db.session.connection(), [row.user_id for row in found if row.status == 'pending'])
+        CourseSubmission.query.filter(
+            CourseSubmission.id.in_(reviewed),
+            CourseSubmission.status == 'pending'
+        ).update({
+            'status': status,
+            'review_comments': review_comments,
+            'reviewed_by': current_user.id,
+            'reviewed_at': datetime.utcnow(),
+            'change_seq': cursor_value(CourseSubmission.user_id)
+        }, synchronize_session=False)
+        # A batch too large for a NOTIFY payload arrives without its ids; admin pages re-fetch the queue then
+        broker.publish(
+            'submissions_reviewed',
+            {'ids': reviewed, 'status': status},
+            stats={'pending_submissions': -len(reviewed)}
+        )
+    db.session.commit()
+
+    outcomes = {i: 'reviewed' for i in reviewed}
+    results = [
+        {'id': i, 'outcome': outcomes.get(i, 'already_reviewed' if i in current else 'not_found')}
+        for i in submission_ids
+    ]
+    return jsonify({
+        'message': f'{len(reviewed)} submissions {status}',
+        'reviewed': len(reviewed),
+        'results': results
+    })
+
+@app.route('/api/admin/events')
+@login_required
+def admin_events():
+    """Server-sent event stream of new submissions, review decisions and stat deltas"""
+    if current_user.role not in ['admin', 'super_admin']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    subscriber = broker.subscribe()
+    # Release the DB connection - the stream only reads from the broker
+    db.session.remove()
+    
+    def generate():
+        try:
+            yield 'retry: 5000\n\n'
+            while True:
+                try:
+                    payload = subscriber.get(timeout=15)
+                except queue.Empty:
+                    # Keep-alive comment so proxies don't close the idle stream
+                    yield ': keep-alive\n\n'
+                    continue
+                yield format_sse(payload)
+        finally:
+            broker.unsubscribe(subscriber)
+    
+    return Response(stream_with_context(generate()), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+@app.route('/api/search')
+@login_required
+def search_api():
+    """Ranked full-text search. Students only see active courses and their files"""
+    query = request.args.get('q', '').strip()
+    types = [t for t in request.args.get('type', '').split(',') if t]
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+    
+    unknown = [t for t in types if t not in SEARCH_TARGETS]
+    if unknown:
+        return jsonify({'error': f"Unknown search type: {', '.join(unknown)}"}), 400
+    
+    try:
+        hits, has_more = search(
+            query,
+            types=types,
+            is_admin=current_user.role in ['admin', 'super_admin'],
+            page=page,
+            per_page=per_page
+        )
+    except SearchUnavailable as e:
+        print(e)
+        return jsonify({'error': 'Search is temporarily unavailable'}), 503
+    
+    return jsonify({
+        'query': query,
+        'results': hits,
+        'page': page,
+        'per_page': per_page,
+        'has_more': has_more
+    })
+
 # Course API Routes
 @app.route('/api/courses')
 @login_required
 def get_courses():
-    courses = Course.query.filter_by(is_active=True).order_by(Course.order).all()
-    return jsonify([{
-        'id': c.id,
-        'title': c.title,
-        'description': c.description,
-        'duration': c.duration,
-        'order': c.order,
-        'is_active': c.is_active
-    } for c in courses])
+    courses = select('course').filter(Course.is_active == True).order_by(Course.order)
+    return jsonify(rows(courses))
 
 @app.route('/api/courses/<course_id>')
 @login_required
 def get_course(course_id):
-    course = Course.query.get_or_404(course_id)
-    return jsonify({
-        'id': course.id,
-        'title': course.title,
-        'description': course.description,
-        'duration': course.duration,
-        'order': course.order,
-        'is_active': course.is_active
-    })
+    course = select('course').filter(Course.id == course_id)
+    return jsonify(one_or_404(course))
 
 @app.route('/api/courses/<course_id>/files')
 @login_required
 def get_course_files(course_id):
-    files = CourseFile.query.filter_by(course_id=course_id).order_by(CourseFile.order).all()
-    return jsonify([{
-        'id': f.id,
-        'title': f.title,
-        'description': f.description,
-        'file_type': f.file_type,
-        'file_path': f.file_path,
-        'file_size': f.file_size,
-        'duration': f.duration,
-        'order': f.order
-    } for f in files])
+    files = select('course_file').filter(CourseFile.course_id == course_id).order_by(CourseFile.order)
+    return jsonify(rows(files))
 
 @app.route('/api/submissions')
 @login_required
 def get_user_submissions():
-    submissions = CourseSubmission.query.filter_by(user_id=current_user.id).order_by(CourseSubmission.submitted_at.desc()).all()
-    return jsonify([{
-        'id': s.id,
-        'course_id': s.course_id,
-        'file_name': s.file_name,
-        'file_path': s.file_path,
-        'file_size': s.file_size,
-        'comments': s.comments,
-        'status': s.status,
-        'review_comments': s.review_comments,
-        'submitted_at': s.submitted_at.isoformat(),
-        'reviewed_at': s.reviewed_at.isoformat() if s.reviewed_at else None
-    } for s in submissions])
+    if request.args.get('summary') or 'since' in request.args:
+        return sync_response('submission')
+    
+    return jsonify(submission_rows(current_user.id))
+
+def sync_response(kind):
+    """?since=<cursor> returns only what changed after the cursor; ?summary=1 per-course counts"""
+    if request.args.get('summary'):
+        return jsonify(sync_summary(kind, current_user.id))
+    
+    since = request.args.get('since', type=int)
+    if since is None:
+        return jsonify({'error': 'since must be an integer cursor'}), 400
+    return jsonify(sync_delta(kind, current_user.id, since))
 
 # Admin course file management routes
+@app.route('/api/admin/courses/<course_id>/completion')
+@login_required
+def get_course_completion(course_id):
+    if current_user.role not in ['admin', 'super_admin']:
+        return jsonify({'error': 'Unauthorized'}), 403
+    
+    Course.query.get_or_404(course_id)
+    return jsonify(course_completion(course_id))
+
 @app.route('/api/admin/courses/<course_id>/files')
 @login_required
 def get_course_files_admin(course_id):
     if current_user.role not in ['admin', 'super_admin']:
         return jsonify({'error': 'Unauthorized'}), 403
     
-    files = CourseFile.query.filter_by(course_id=course_id).order_by(CourseFile.order).all()
-    return jsonify([{
-        'id': f.id,
-        'title': f.title,
-        'description': f.description,
-        'file_type': f.file_type,
-        'file_path': f.file_path,
-        'file_size': f.file_size,
-        'duration': f.duration,
-        'order': f.order,
-        'created_at': f.created_at.isoformat()
-    } for f in files])
+    files = select('course_file_admin').filter(CourseFile.course_id == course_id).order_by(CourseFile.order)
+    return jsonify(rows(files))
 
 @app.route('/api/admin/courses/<course_id>/files/<file_id>', methods=['DELETE'])
 @login_required
@@ -606,12 +768,13 @@ def delete_course_file(course_id, file_id):
     
     # Delete physical file
     try:
-        if os.path.exists(course_file.file_path):
-            os.remove(course_file.file_path)
+        storage.delete(course_file.file_path)
     except Exception as e:
         print(f"Error deleting file: {e}")
     
     # Delete database record
+    if course_file.bit_index is not None:
+        clear_file(course_file.course_id, course_file.bit_index)
     db.session.delete(course_file)
     db.session.commit()
     
@@ -651,20 +814,11 @@ def organize_course_files(course_id):
             # Create new organized path
             file_extension = file.file_path.split('.')[-1]
             new_filename = f"{datetime.now().strftime('%Y%m%d_%H%M%S')}_{secure_filename(file.title)}.{file_extension}"
-            new_path = os.path.join(
-                app.config['UPLOAD_FOLDER'], 
-                'course-files', 
-                course_id, 
-                file.file_type, 
-                new_filename
-            )
-            
-            # Create directory structure
-            os.makedirs(os.path.dirname(new_path), exist_ok=True)
+            new_path = f"course-files/{course_id}/{file.file_type}/{new_filename}"
             
             # Move file if it exists
-            if os.path.exists(file.file_path):
-                os.rename(file.file_path, new_path)
+            if storage.exists(file.file_path):
+                storage.move(file.file_path, new_path)
                 file.file_path = new_path
                 organized_count += 1
     
@@ -679,17 +833,26 @@ def organize_course_files(course_id):
 @app.route('/uploads/<path:filename>')
 @login_required
 def uploaded_file(filename):
+    if not storage.local:
+        # Presigned link - the client fetches (and range-requests) the object directly
+        return redirect(storage.url(filename))
     return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
 
 @app.route('/uploads/course-files/<course_id>/<file_type>/<filename>')
 @login_required
 def serve_organized_file(course_id, file_type, filename):
     """Serve files from organized folder structure"""
-    file_path = os.path.join('course-files', course_id, file_type)
-    return send_from_directory(os.path.join(app.config['UPLOAD_FOLDER'], file_path), filename)
+    return uploaded_file(f"course-files/{course_id}/{file_type}/{filename}")
+
+@app.context_processor
+def inject_file_url():
+    # Templates link to stored files through the storage backend
+    return {'file_url': storage.url}
 
 if __name__ == '__main__':
     with app.app_context():
         db.create_all()
+        create_partitions()
+        create_search_index()
     # Run on port 5001 since 5000 is used by the Node.js server
     app.run(host='0.0.0.0', port=5001, debug=True)
\ No newline at end of file
@@ -0,0 +1,321 @@
+import contextlib
+import gzip
+import os
+import re
+import shutil
+import tempfile
+from collections import defaultdict
+from datetime import datetime
+from sqlalchemy import exists, text, tuple_
+from sqlalchemy.orm import aliased
+from models import db, UserProgress, CourseSubmission, ArchivedProgress, ArchivedSubmission
+from serializers import select, rows
+
+# Hot tables and the timestamp each is range-partitioned on (PostgreSQL only)
+PARTITIONED_TABLES = {
+    'user_progress': 'completed_at',
+    'course_submissions': 'submitted_at',
+}
+
+# Storage prefix for gzipped submission files of archived cohorts
+ARCHIVE_PREFIX = 'archive'
+INCOMING_DIR = '.incoming'
+CHUNK_SIZE = 1024 * 1024
+
+EXPORT_COLUMNS = {
+    'progress': ['user_id', 'course_id', 'file_id', 'completed_at', 'archived'],
+    'submissions': [
+        'id', 'user_id', 'course_id', 'file_name', 'file_path', 'file_size', 'checksum',
+        'comments', 'status', 'reviewed_by', 'review_comments', 'submitted_at', 'reviewed_at', 'archived'
+    ],
+}
+
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _month_start(value):
+    return datetime(value.year, value.month, 1)
+
+
+def _next_month(value):
+    return datetime(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def _partition_name(table, start):
+    return f"{table}_y{start.year}m{start.month:02d}"
+
+
+def _is_partitioned(connection, table):
+    kind = connection.execute(
+        text("SELECT relkind FROM pg_class WHERE oid = to_regclass(:name)"), {'name': table}
+    ).scalar()
+    return kind == 'p'
+
+
+def _create_monthly_partitions(connection, table, column, first, months_ahead):
+    start = _month_start(first)
+    last = _month_start(datetime.utcnow())
+    for _ in range(months_ahead):
+        last = _next_month(last)
+    while start <= last:
+        stop = _next_month(start)
+        name = _partition_name(table, start)
+        bounds = {'start': start, 'stop': stop}
+        if connection.execute(text("SELECT to_regclass(:name)"), {'name': name}).scalar() is None:
+            in_default = connection.execute(text(
+                f"SELECT EXISTS (SELECT 1 FROM {table}_default WHERE {column} >= :start AND {column} < :stop)"
+            ), bounds).scalar()
+            # PostgreSQL refuses a new range while the default partition holds rows in it,
+            # so those rows are moved into the new partition with the default detached
+            if in_default:
+                connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {table}_default"))
+            connection.execute(text(
+                f"CREATE TABLE {name} PARTITION OF {table} "
+                f"FOR VALUES FROM ('{start.isoformat()}') TO ('{stop.isoformat()}')"
+            ))
+            if in_default:
+                connection.execute(text(
+                    f"INSERT INTO {name} SELECT * FROM {table}_default "
+                    f"WHERE {column} >= :start AND {column} < :stop"
+                ), bounds)
+                connection.execute(text(
+                    f"DELETE FROM {table}_default WHERE {column} >= :start AND {column} < :stop"
+                ), bounds)
+                connection.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {table}_default DEFAULT"))
+        start = stop
+
+
+def _convert_to_partitioned(connection, table, column, months_ahead):
+    legacy = f"{table}_unpartitioned"
+    connection.execute(text(f"ALTER TABLE {table} RENAME TO {legacy}"))
+    connection.execute(text(
+        f"CREATE TABLE {table} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE ({column})"
+    ))
+    # The partition key has to be part of the primary key; ids are still UUIDs
+    connection.execute(text(
+        f"ALTER TABLE {table} ADD CONSTRAINT {table}_partitioned_pkey PRIMARY KEY (id, {column})"
+    ))
+    for fk in db.metadata.tables[table].foreign_keys:
+        connection.execute(text(
+            f"ALTER TABLE {table} ADD FOREIGN KEY ({fk.parent.name}) "
+            f"REFERENCES {fk.column.table.name} ({fk.column.name})"
+        ))
+    connection.execute(text(f"CREATE INDEX ix_{table}_user_course ON {table} (user_id, course_id)"))
+    # Catches rows outside every monthly range instead of failing the insert
+    connection.execute(text(f"CREATE TABLE {table}_default PARTITION OF {table} DEFAULT"))
+
+    first = connection.execute(text(f"SELECT min({column}) FROM {legacy}")).scalar()
+    _create_monthly_partitions(connection, table, column, first or datetime.utcnow(), months_ahead)
+    connection.execute(text(f"INSERT INTO {table} SELECT * FROM {legacy}"))
+    connection.execute(text(f"DROP TABLE {legacy}"))
+    # Model indexes went with the old table; their names are free again
+    for index in db.metadata.tables[table].indexes:
+        index.create(connection)
+
+
+def create_partitions(months_ahead=12):
+    """Range-partition the hot history tables by month on PostgreSQL.
+
+    Existing plain tables are converted in place (in one transaction), and
+    monthly partitions are created up to months_ahead months from now. Run
+    it again at least once a year - archive_data.py partitions does this -
+    so new rows keep landing in a monthly partition rather than the default
+    one. Other databases keep plain tables.
+    """
+    if not _is_postgres():
+        return
+    with db.engine.begin() as connection:
+        for table, column in PARTITIONED_TABLES.items():
+            if _is_partitioned(connection, table):
+                _create_monthly_partitions(connection, table, column, datetime.utcnow(), months_ahead)
+            else:
+                _convert_to_partitioned(connection, table, column, months_ahead)
+
+
+def drop_empty_partitions(before):
+    """Drop monthly partitions that end before the cutoff and hold no rows. Returns their names"""
+    if not _is_postgres():
+        return []
+    dropped = []
+    with db.engine.begin() as connection:
+        for table in PARTITIONED_TABLES:
+            partitions = connection.execute(text(
+                "SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid "
+                "WHERE i.inhparent = to_regclass(:name)"
+            ), {'name': table}).scalars().all()
+            for name in partitions:
+                match = re.fullmatch(rf"{table}_y(\d{{4}})m(\d{{2}})", name)
+                if not match:
+                    continue
+                if _next_month(datetime(int(match.group(1)), int(match.group(2)), 1)) > before:
+                    continue
+                if connection.execute(text(f"SELECT 1 FROM {name} LIMIT 1")).first():
+                    continue
+                connection.execute(text(f"DROP TABLE {name}"))
+                dropped.append(name)
+    return dropped
+
+
+def finished_cohorts(before):
+    """(user_id, course_id) pairs whose report was approved before the cutoff
+    and who have no newer report still waiting for review"""
+    pending = aliased(CourseSubmission)
+    query = db.session.query(CourseSubmission.user_id, CourseSubmission.course_id).filter(
+        CourseSubmission.status == 'approved',
+        CourseSubmission.reviewed_at < before,
+        ~exists().where(
+            pending.user_id == CourseSubmission.user_id,
+            pending.course_id == CourseSubmission.course_id,
+            pending.status == 'pending'
+        )
+    ).distinct()
+    return [tuple(row) for row in query]
+
+
+def _compress(storage, key, archive_key):
+    temp_dir = os.path.join(storage.root, INCOMING_DIR)
+    os.makedirs(temp_dir, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=temp_dir, prefix='.archive-')
+    try:
+        with contextlib.closing(storage.open_range(key)) as source, os.fdopen(fd, 'wb') as raw:
+            with gzip.GzipFile(fileobj=raw, mode='wb', mtime=0) as target:
+                shutil.copyfileobj(source, target, CHUNK_SIZE)
+        storage.put_file(archive_key, temp_path, 'application/gzip')
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def archive_cohorts(storage, cohorts):
+    """Move the hot rows of these cohorts into the archive tables in one transaction.
+
+    Progress rows are packed into one ArchivedProgress row per cohort, and
+    submission files are gzipped under archive/. Returns (progress rows,
+    submissions, original file keys); the originals are still in storage and
+    should be deleted by the caller once this has returned.
+    """
+    progress = UserProgress.query.filter(
+        tuple_(UserProgress.user_id, UserProgress.course_id).in_(cohorts)
+    ).order_by(UserProgress.completed_at).all()
+    packed = {
+        (row.user_id, row.course_id): row
+        for row in ArchivedProgress.query.filter(
+            tuple_(ArchivedProgress.user_id, ArchivedProgress.course_id).in_(cohorts)
+        )
+    }
+    submissions = CourseSubmission.query.filter(
+        tuple_(CourseSubmission.user_id, CourseSubmission.course_id).in_(cohorts)
+    ).all()
+
+    written = []
+    originals = []
+    try:
+        grouped = defaultdict(list)
+        for row in progress:
+            grouped[(row.user_id, row.course_id)].append([row.file_id, row.completed_at.isoformat(), row.id])
+        for (user_id, course_id), completions in grouped.items():
+            archived = packed.get((user_id, course_id))
+            if archived is None:
+                db.session.add(ArchivedProgress(user_id=user_id, course_id=course_id, completions=completions))
+            else:
+                # Files completed again after an earlier archive run
+                archived.completions = archived.completions + completions
+
+        for submission in submissions:
+            key = storage.key_for(submission.file_path)
+            archive_key = key
+            if storage.exists(key):
+                archive_key = f"{ARCHIVE_PREFIX}/{key}.gz"
+                _compress(storage, key, archive_key)
+                written.append(archive_key)
+                originals.append(key)
+            db.session.add(ArchivedSubmission(
+                id=submission.id,
+                user_id=submission.user_id,
+                course_id=submission.course_id,
+                file_path=archive_key,
+                file_name=submission.file_name,
+                file_size=submission.file_size,
+                checksum=submission.checksum,
+                comments=submission.comments,
+                status=submission.status,
+                reviewed_by=submission.reviewed_by,
+                review_comments=submission.review_comments,
+                submitted_at=submission.submitted_at,
+                reviewed_at=submission.reviewed_at
+            ))
+
+        # Moving rows to cold storage is not a deletion clients should see, so
+        # these bulk deletes deliberately leave no sync tombstones
+        UserProgress.query.filter(
+            UserProgress.id.in_([row.id for row in progress])
+        ).delete(synchronize_session=False)
+        CourseSubmission.query.filter(
+            CourseSubmission.id.in_([s.id for s in submissions])
+        ).delete(synchronize_session=False)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        for archive_key in written:
+            storage.delete(archive_key)
+        raise
+
+    return len(progress), len(submissions), originals
+
+
+def completed_submissions(user_id):
+    """A student's approved submissions, including archived ones"""
+    archived = ArchivedSubmission.query.filter_by(user_id=user_id, status='approved').all()
+    return archived + CourseSubmission.query.filter_by(user_id=user_id, status='approved').all()
+
+
+def submission_history(user_id):
+    """Every submission of a student, including archived ones"""
+    archived = ArchivedSubmission.query.filter_by(user_id=user_id).all()
+    return archived + CourseSubmission.query.filter_by(user_id=user_id).all()
+
+
+def progress_rows(user_id):
+    """A student's progress as API rows, oldest first, including archived completions"""
+    archived = [
+        {
+            'id': progress_id, 'course_id': row.course_id, 'file_id': file_id,
+            'completed_at': datetime.fromisoformat(completed_at)
+        }
+        for row in ArchivedProgress.query.filter_by(user_id=user_id)
+        for file_id, completed_at, progress_id in row.completions
+    ]
+    hot = rows(select('progress').filter(UserProgress.user_id == user_id))
+    return sorted(archived + hot, key=lambda p: p['completed_at'])
+
+
+def submission_rows(user_id):
+    """A student's submissions as API rows, newest first, including archived ones"""
+    archived = rows(select('archived_submission').filter(ArchivedSubmission.user_id == user_id))
+    hot = rows(select('submission').filter(CourseSubmission.user_id == user_id))
+    return sorted(archived + hot, key=lambda s: s['submitted_at'], reverse=True)
+
+
+def export_rows(kind):
+    """Yield every row of a history table - hot and archived - as dicts"""
+    if kind == 'progress':
+        hot = db.session.query(
+            UserProgress.user_id, UserProgress.course_id, UserProgress.file_id, UserProgress.completed_at
+        ).order_by(UserProgress.completed_at)
+        for row in hot.yield_per(1000):
+            yield dict(row._asdict(), archived=False)
+        for row in ArchivedProgress.query.order_by(ArchivedProgress.archived_at).yield_per(100):
+            for file_id, completed_at, _ in row.completions:
+                yield {
+                    'user_id': row.user_id, 'course_id': row.course_id, 'file_id': file_id,
+                    'completed_at': completed_at, 'archived': True
+                }
+        return
+
+    columns = EXPORT_COLUMNS['submissions'][:-1]
+    for model, archived in ((CourseSubmission, False), (ArchivedSubmission, True)):
+        query = db.session.query(*(getattr(model, c) for c in columns)).order_by(model.submitted_at)
+        for row in query.yield_per(1000):
+            yield dict(row._asdict(), archived=archived)
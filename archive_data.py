@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Hot/cold archival for Seedsowers Ministry
+Moves finished cohorts - students whose course report was approved before a
+cutoff - out of user_progress and course_submissions into the archive tables,
+gzipping their submission files, and maintains the monthly partitions of the
+hot tables on PostgreSQL
+
+    python archive_data.py partitions
+    python archive_data.py archive --before 2026-01-01 [--dry-run]
+    python archive_data.py export submissions --output submissions.csv
+    python archive_data.py prune-tombstones [--days 90]
+"""
+
+import argparse
+import csv
+import os
+import sys
+from datetime import datetime, timedelta
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, storage
+from search import create_search_index
+from sync import TOMBSTONE_RETENTION_DAYS, prune_tombstones
+from archive import (
+    EXPORT_COLUMNS, archive_cohorts, create_partitions, drop_empty_partitions,
+    export_rows, finished_cohorts
+)
+
+
+def run_partitions(args):
+    with app.app_context():
+        if db.engine.dialect.name != 'postgresql':
+            print(f"ℹ️  Partitioning needs PostgreSQL ({db.engine.dialect.name} keeps plain tables)")
+            return
+        create_partitions(args.months_ahead)
+        # Converting a table drops the indexes of the old one
+        create_search_index()
+        print(f"✅ Monthly partitions in place through {args.months_ahead} months from now")
+
+
+def run_archive(args):
+    before = datetime.strptime(args.before, '%Y-%m-%d')
+    with app.app_context():
+        cohorts = finished_cohorts(before)
+        print(f"📦 {len(cohorts)} finished cohorts approved before {args.before}")
+        if args.dry_run or not cohorts:
+            return
+
+        totals = [0, 0]
+        for start in range(0, len(cohorts), args.batch_size):
+            batch = cohorts[start:start + args.batch_size]
+            progress, submissions, originals = archive_cohorts(storage, batch)
+            # The archived rows are committed, so the uncompressed originals can go
+            for key in originals:
+                try:
+                    storage.delete(key)
+                except Exception as e:
+                    print(f"❌ Could not remove {key}: {e}")
+            totals[0] += progress
+            totals[1] += submissions
+            print(f"✅ Archived {len(batch)} cohorts ({progress} progress rows, {submissions} submissions)")
+
+        print(f"\n{totals[0]} progress rows and {totals[1]} submissions moved to cold storage")
+        for name in drop_empty_partitions(before):
+            print(f"🗑️  Dropped empty partition {name}")
+
+
+def run_export(args):
+    with app.app_context():
+        output = open(args.output, 'w', newline='') if args.output else sys.stdout
+        try:
+            writer = csv.DictWriter(output, fieldnames=EXPORT_COLUMNS[args.kind])
+            writer.writeheader()
+            for row in export_rows(args.kind):
+                writer.writerow(row)
+        finally:
+            if args.output:
+                output.close()
+
+
+def run_prune_tombstones(args):
+    with app.app_context():
+        pruned = prune_tombstones(datetime.utcnow() - timedelta(days=args.days))
+        print(f"🗑️  Pruned {pruned} sync tombstones older than {args.days} days")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Archive finished cohorts and maintain history partitions')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    partitions = commands.add_parser('partitions', help='create upcoming monthly partitions (PostgreSQL)')
+    partitions.add_argument('--months-ahead', type=int, default=12)
+    partitions.set_defaults(run=run_partitions)
+
+    archive = commands.add_parser('archive', help='move finished cohorts into cold storage')
+    archive.add_argument('--before', required=True, help='archive cohorts approved before this date (YYYY-MM-DD)')
+    archive.add_argument('--batch-size', type=int, default=200, help='cohorts moved per transaction')
+    archive.add_argument('--dry-run', action='store_true', help='only report what would be archived')
+    archive.set_defaults(run=run_archive)
+
+    export = commands.add_parser('export', help='write hot and archived history as CSV')
+    export.add_argument('kind', choices=sorted(EXPORT_COLUMNS))
+    export.add_argument('--output', help='file to write (default: stdout)')
+    export.set_defaults(run=run_export)
+
+    prune = commands.add_parser('prune-tombstones', help='delete old delta sync tombstones')
+    prune.add_argument('--days', type=int, default=TOMBSTONE_RETENTION_DAYS, help='keep tombstones this many days')
+    prune.set_defaults(run=run_prune_tombstones)
+
+    args = parser.parse_args()
+    args.run(args)
+
+
+if __name__ == '__main__':
+    main()
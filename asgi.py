@@ -0,0 +1,354 @@
+"""
+ASGI entry point for Seedsowers Ministry
+
+    uvicorn asgi:application --host 0.0.0.0 --port 5001
+
+Media downloads, course file / report uploads and the admin event stream
+are handled natively on the event loop, so a slow client no longer holds a
+worker thread for the length of a transfer. Upload bodies are read from the
+socket asynchronously and then handed to the unchanged Flask view. File
+reads/writes and every database call (auth checks, the view itself) run in
+the default thread pool, so only the short blocking steps use a thread.
+Every other route is served by the regular Flask app through asgiref's
+WSGI adapter.
+
+Requires asgiref and an ASGI server such as uvicorn - the asgi extra
+(`uv sync --extra asgi`), not needed for the default WSGI deployment.
+"""
+
+import asyncio
+import mimetypes
+import os
+import sys
+from io import BytesIO
+from asgiref.wsgi import WsgiToAsgi
+from flask_login import current_user
+from werkzeug.datastructures import FileStorage, MultiDict
+from werkzeug.exceptions import HTTPException
+from werkzeug.http import (
+    http_date, is_resource_modified, parse_if_range_header, parse_options_header,
+    parse_range_header, quote_etag,
+)
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+from werkzeug.security import safe_join
+
+from app import app, storage
+from events import broker, format_sse
+from uploads import PREPARSED_FORM_KEY, UploadRejected, open_ingest, upload_request_limit
+
+CHUNK_SIZE = 256 * 1024
+KEEP_ALIVE_SECONDS = 15
+
+# Endpoints whose files are streamed from disk by the event loop
+MEDIA_ENDPOINTS = {
+    'uploaded_file': lambda args: args['filename'],
+    'serve_organized_file': lambda args: f"course-files/{args['course_id']}/{args['file_type']}/{args['filename']}",
+}
+
+wsgi_application = WsgiToAsgi(app)
+
+
+def build_environ(scope, body=b''):
+    """Minimal WSGI environ for an ASGI HTTP scope"""
+    root_path = scope.get('root_path', '')
+    path = scope['path'][len(root_path):] if scope['path'].startswith(root_path) else scope['path']
+    server_name, server_port = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': root_path.encode('utf-8').decode('latin-1'),
+        'PATH_INFO': path.encode('utf-8').decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': server_name,
+        'SERVER_PORT': str(server_port),
+        'SERVER_PROTOCOL': f"HTTP/{scope.get('http_version', '1.1')}",
+        'REMOTE_ADDR': (scope.get('client') or ('', 0))[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    for raw_name, raw_value in scope['headers']:
+        name = raw_name.decode('latin-1').upper().replace('-', '_')
+        value = raw_value.decode('latin-1')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        environ[name] = f"{environ[name]},{value}" if name in environ else value
+    return environ
+
+
+def match_endpoint(environ):
+    try:
+        return app.url_map.bind_to_environ(environ).match()
+    except HTTPException:
+        # 404/405/redirects are left to Flask to answer
+        return None, None
+
+
+def check_user(environ, roles=None):
+    """Load the session user the same way login_required would, and check their role"""
+    with app.request_context(environ):
+        if not current_user.is_authenticated:
+            return False
+        return roles is None or current_user.role in roles
+
+
+def call_flask(environ):
+    """Run the Flask app for one buffered request and collect its response"""
+    response = {}
+
+    def start_response(status, headers, exc_info=None):
+        response['status'] = int(status.split(' ', 1)[0])
+        response['headers'] = headers
+
+    result = app(environ, start_response)
+    try:
+        response['body'] = b''.join(result)
+    finally:
+        if hasattr(result, 'close'):
+            result.close()
+    return response
+
+
+async def send_response(send, status, headers, body=b''):
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(k.encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+    })
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def range_still_valid(environ, etag, mtime):
+    """If-Range: a partial response only if the client's copy is still current, else the whole file"""
+    if_range = parse_if_range_header(environ.get('HTTP_IF_RANGE'))
+    if if_range.etag is not None:
+        return quote_etag(if_range.etag) == etag
+    if if_range.date is not None:
+        return if_range.date.timestamp() >= mtime
+    return True
+
+
+async def serve_media(scope, receive, send, environ, key):
+    path = safe_join(storage.root, key)
+    if path is None or not os.path.isfile(path):
+        return await wsgi_application(scope, receive, send)
+
+    f = await asyncio.to_thread(open, path, 'rb')
+    try:
+        stat = os.fstat(f.fileno())
+        size = stat.st_size
+        last_modified = http_date(int(stat.st_mtime))
+        etag = quote_etag(f'{stat.st_mtime}-{size}')
+        validators = [
+            ('ETag', etag),
+            ('Last-Modified', last_modified),
+            ('Cache-Control', 'no-cache'),
+        ]
+        if not is_resource_modified(environ, etag=etag, last_modified=last_modified):
+            return await send_response(send, 304, validators)
+
+        headers = [
+            ('Content-Type', mimetypes.guess_type(path)[0] or 'application/octet-stream'),
+            ('Accept-Ranges', 'bytes'),
+        ] + validators
+        start, stop, status = 0, size, 200
+        byte_range = parse_range_header(environ.get('HTTP_RANGE'))
+        if environ.get('HTTP_RANGE') and range_still_valid(environ, etag, int(stat.st_mtime)):
+            bounds = byte_range.range_for_length(size) if byte_range else None
+            if bounds is None:
+                return await send_response(send, 416, [('Content-Range', f'bytes */{size}')])
+            start, stop = bounds
+            status = 206
+            headers.append(('Content-Range', f'bytes {start}-{stop - 1}/{size}'))
+        headers.append(('Content-Length', str(stop - start)))
+
+        await send({
+            'type': 'http.response.start',
+            'status': status,
+            'headers': [(k.encode('latin-1'), v.encode('latin-1')) for k, v in headers],
+        })
+        if scope['method'] == 'HEAD':
+            return await send({'type': 'http.response.body', 'body': b''})
+
+        await asyncio.to_thread(f.seek, start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = await asyncio.to_thread(f.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            await send({'type': 'http.response.body', 'body': chunk, 'more_body': remaining > 0})
+        if remaining > 0:
+            # File shrank while streaming - end the response rather than hang
+            await send({'type': 'http.response.body', 'body': b''})
+    finally:
+        await asyncio.to_thread(f.close)
+
+
+async def stream_admin_events(scope, receive, send):
+    with app.app_context():
+        subscriber = broker.subscribe_async()
+    disconnected = asyncio.Event()
+
+    async def watch_disconnect():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+        disconnected.set()
+
+    watcher = asyncio.create_task(watch_disconnect())
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream; charset=utf-8'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        while not disconnected.is_set():
+            try:
+                payload = await asyncio.wait_for(subscriber.queue.get(), KEEP_ALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                message = ': keep-alive\n\n'
+            else:
+                with app.app_context():
+                    message = format_sse(payload)
+            await send({'type': 'http.response.body', 'body': message.encode('utf-8'), 'more_body': True})
+    except OSError:
+        # Client went away mid-send
+        pass
+    finally:
+        watcher.cancel()
+        broker.unsubscribe(subscriber)
+
+
+async def read_upload(receive, environ, allowed_extensions):
+    """Read a multipart body from the socket into IngestFiles.
+
+    Returns (form, files), or the UploadRejected that stopped the upload.
+    """
+    _, options = parse_options_header(environ.get('CONTENT_TYPE', ''))
+    boundary = options.get('boundary', '').encode('latin-1')
+    if not boundary:
+        return MultiDict(), MultiDict()
+
+    decoder = MultipartDecoder(boundary, max_form_memory_size=app.config.get('MAX_FORM_MEMORY_SIZE'))
+    fields, files = [], []
+    part, container = None, None
+    received = 0
+    limit = upload_request_limit(app)
+    ingests = []
+
+    try:
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                raise UploadRejected('Upload interrupted')
+            body = message.get('body', b'')
+            more_body = message.get('more_body', False)
+            received += len(body)
+            if received > limit:
+                raise UploadRejected('File too large', 413)
+
+            decoder.receive_data(body)
+            if not more_body:
+                decoder.receive_data(None)
+
+            event = decoder.next_event()
+            while not isinstance(event, (Epilogue, NeedData)):
+                if isinstance(event, Field):
+                    part, container = event, []
+                elif isinstance(event, File):
+                    part = event
+                    if not event.filename:
+                        # Empty file input - left for the view to report as no file selected
+                        container = BytesIO()
+                    else:
+                        container = await asyncio.to_thread(open_ingest, app, event.filename, allowed_extensions)
+                        ingests.append(container)
+                elif isinstance(event, Data):
+                    if isinstance(part, Field):
+                        container.append(event.data)
+                    else:
+                        await asyncio.to_thread(container.write, event.data)
+                    if not event.more_data:
+                        if isinstance(part, Field):
+                            fields.append((part.name, b''.join(container).decode('utf-8', 'replace')))
+                        else:
+                            await asyncio.to_thread(container.seek, 0)
+                            files.append((part.name, FileStorage(container, part.filename, part.name, headers=part.headers)))
+                event = decoder.next_event()
+    except UploadRejected as e:
+        for ingest in ingests:
+            await asyncio.to_thread(ingest.close)
+        return e
+    except ValueError:
+        for ingest in ingests:
+            await asyncio.to_thread(ingest.close)
+        return UploadRejected('Malformed upload')
+
+    return MultiDict(fields), MultiDict(files)
+
+
+async def handle_upload(scope, receive, send, environ, allowed_extensions):
+    environ[PREPARSED_FORM_KEY] = await read_upload(receive, environ, allowed_extensions)
+    # Flask sees an empty body; the view reads the pre-parsed form and files
+    environ['CONTENT_LENGTH'] = '0'
+    try:
+        response = await asyncio.to_thread(call_flask, environ)
+    finally:
+        preparsed = environ[PREPARSED_FORM_KEY]
+        if not isinstance(preparsed, UploadRejected):
+            for _, storage_file in preparsed[1].items(multi=True):
+                await asyncio.to_thread(storage_file.stream.close)
+    await send_response(send, response['status'], response['headers'], response['body'])
+
+
+async def refuse_upload(send, environ):
+    """Answer an upload the user may not make without reading its body.
+
+    The view runs on an empty body, so it gives the usual login redirect or 403.
+    """
+    environ['CONTENT_LENGTH'] = '0'
+    response = await asyncio.to_thread(call_flask, environ)
+    await send_response(send, response['status'], response['headers'], response['body'])
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                return await send({'type': 'lifespan.shutdown.complete'})
+
+    environ = build_environ(scope)
+    endpoint, args = match_endpoint(environ)
+
+    if endpoint in MEDIA_ENDPOINTS and storage.local and scope['method'] in ('GET', 'HEAD'):
+        if await asyncio.to_thread(check_user, environ):
+            return await serve_media(scope, receive, send, environ, MEDIA_ENDPOINTS[endpoint](args))
+
+    elif endpoint == 'admin_events':
+        if await asyncio.to_thread(check_user, environ, ['admin', 'super_admin']):
+            return await stream_admin_events(scope, receive, send)
+
+    elif endpoint is not None and scope['method'] == 'POST':
+        view = app.view_functions[endpoint]
+        allowed_extensions = getattr(view, 'upload_extensions', None)
+        if allowed_extensions is not None:
+            if await asyncio.to_thread(check_user, environ, getattr(view, 'upload_roles', None)):
+                return await handle_upload(scope, receive, send, environ, allowed_extensions)
+            return await refuse_upload(send, environ)
+
+    # Everything else - including unauthenticated media and event stream
+    # requests, which get the normal login redirect or 403 - goes through
+    # the regular Flask app
+    return await wsgi_application(scope, receive, send)
@@ -0,0 +1,81 @@
+import json
+import mimetypes
+import os
+from flask import request, send_from_directory, url_for
+
+MANIFEST_PATH = os.path.join('dist', 'manifest.json')
+
+# Precompressed variants written by build_assets.py, in order of preference
+ENCODINGS = [
+    ('br', '.br'),
+    ('gzip', '.gz'),
+]
+
+ONE_YEAR = 365 * 24 * 60 * 60
+
+
+class AssetManifest:
+    """Maps source asset names to the fingerprinted files built by build_assets.py.
+
+    Without a build (e.g. in development) asset_url() falls back to the
+    unminified source files.
+    """
+
+    def __init__(self, app=None):
+        self.entries = {}
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.load()
+        app.context_processor(lambda: {'asset_url': self.asset_url})
+        # Hashed files never change, so they get served with year-long caching
+        app.view_functions['static'] = self.serve_static
+
+    def load(self):
+        try:
+            with open(os.path.join(self.app.static_folder, MANIFEST_PATH)) as f:
+                self.entries = json.load(f)
+        except (OSError, ValueError):
+            self.entries = {}
+
+    def asset_url(self, filename):
+        if self.app.debug:
+            self.load()
+        built = self.entries.get(filename)
+        if built is None:
+            return url_for('static', filename=filename)
+        return url_for('static', filename=f"dist/{built}")
+
+    def serve_static(self, filename):
+        if not filename.startswith('dist/'):
+            return self.app.send_static_file(filename)
+        if filename == 'dist/manifest.json':
+            # Rewritten in place by every build, so it must always be revalidated
+            response = self.app.send_static_file(filename)
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+
+        mimetype = mimetypes.guess_type(filename)[0]
+        for encoding, suffix in ENCODINGS:
+            if request.accept_encodings[encoding] and os.path.exists(
+                os.path.join(self.app.static_folder, filename + suffix)
+            ):
+                response = send_from_directory(
+                    self.app.static_folder, filename + suffix, mimetype=mimetype, max_age=ONE_YEAR
+                )
+                response.headers['Content-Encoding'] = encoding
+                # send_file names the .gz/.br file here, which isn't what the client gets
+                response.headers.pop('Content-Disposition', None)
+                break
+        else:
+            response = send_from_directory(self.app.static_folder, filename, max_age=ONE_YEAR)
+
+        response.headers['Cache-Control'] = f'public, max-age={ONE_YEAR}, immutable'
+        response.vary.add('Accept-Encoding')
+        return response
+
+
+assets = AssetManifest()
@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+"""
+Concurrent download benchmark: WSGI vs ASGI serving
+Start the app both ways, e.g.
+
+    gunicorn -w 4 --threads 8 -b 127.0.0.1:5001 app:app
+    uvicorn asgi:application --host 127.0.0.1 --port 5002
+
+then point this script at the same media file on each:
+
+    python bench_asgi.py --path /uploads/course-files/<course>/video/<file> \\
+        --login admin@seedsowers.org:admin123 \\
+        wsgi=http://127.0.0.1:5001 asgi=http://127.0.0.1:5002
+
+Uses only the standard library; every request opens its own connection.
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+from urllib.parse import urlencode, urlsplit
+
+
+async def http_request(url, method='GET', headers=None, body=b'', read_rate=None):
+    """Minimal HTTP/1.1 client. Returns (status, headers, body_length)"""
+    parts = urlsplit(url)
+    reader, writer = await asyncio.open_connection(parts.hostname, parts.port or 80)
+    path = parts.path + (f'?{parts.query}' if parts.query else '')
+    lines = [f'{method} {path} HTTP/1.1', f'Host: {parts.netloc}', 'Connection: close',
+             f'Content-Length: {len(body)}']
+    lines += [f'{k}: {v}' for k, v in (headers or {}).items()]
+    writer.write(('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1') + body)
+    await writer.drain()
+
+    status_line = await reader.readline()
+    status = int(status_line.split()[1])
+    response_headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        response_headers.setdefault(name.strip().lower(), []).append(value.strip())
+
+    length = 0
+    while True:
+        chunk = await reader.read(64 * 1024)
+        if not chunk:
+            break
+        length += len(chunk)
+        if read_rate:
+            # Simulate a slow mobile client
+            await asyncio.sleep(len(chunk) / read_rate)
+    writer.close()
+    return status, response_headers, length
+
+
+async def login(base_url, credentials):
+    email, password = credentials.split(':', 1)
+    body = urlencode({'email': email, 'password': password}).encode()
+    status, headers, _ = await http_request(
+        base_url + '/login', 'POST',
+        {'Content-Type': 'application/x-www-form-urlencoded'}, body
+    )
+    cookies = [c.split(';', 1)[0] for c in headers.get('set-cookie', [])]
+    if status != 302 or not cookies:
+        raise SystemExit(f"❌ Login failed against {base_url} (status {status})")
+    return '; '.join(cookies)
+
+
+async def run(base_url, path, cookie, total, concurrency, read_rate):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+    errors = 0
+    transferred = 0
+
+    async def one():
+        nonlocal errors, transferred
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                status, _, length = await http_request(base_url + path, headers={'Cookie': cookie}, read_rate=read_rate)
+            except OSError:
+                errors += 1
+                return
+            if status != 200:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - started)
+            transferred += length
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(total)))
+    elapsed = time.perf_counter() - started
+    return latencies, errors, transferred, elapsed
+
+
+def report(label, latencies, errors, transferred, elapsed):
+    if not latencies:
+        print(f"{label:>6}: all {errors} requests failed")
+        return
+    quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+    print(
+        f"{label:>6}: {len(latencies) / elapsed:8.1f} req/s  {transferred / elapsed / 1024 / 1024:8.1f} MB/s  "
+        f"p50 {quantiles[49] * 1000:7.1f}ms  p95 {quantiles[94] * 1000:7.1f}ms  "
+        f"p99 {quantiles[98] * 1000:7.1f}ms  errors {errors}"
+    )
+
+
+async def main():
+    parser = argparse.ArgumentParser(description='Compare concurrent media downloads across servers')
+    parser.add_argument('targets', nargs='+', help='label=base_url, e.g. wsgi=http://127.0.0.1:5001')
+    parser.add_argument('--path', required=True, help='media URL path to download')
+    parser.add_argument('--login', required=True, help='email:password of an account')
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--concurrency', type=int, default=100)
+    parser.add_argument('--read-rate', type=int, default=0, help='per-client bytes/second (0 = unthrottled)')
+    args = parser.parse_args()
+
+    print(f"{args.requests} downloads of {args.path}, {args.concurrency} concurrent\n")
+    for target in args.targets:
+        label, base_url = target.split('=', 1)
+        cookie = await login(base_url, args.login)
+        report(label, *await run(base_url, args.path, cookie, args.requests, args.concurrency, args.read_rate or None))
+
+
+if __name__ == '__main__':
+    asyncio.run(main())
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Static asset build for Seedsowers Ministry
+Minifies the CSS/JS bundles, writes content-hashed copies to static/dist
+with gzip/brotli variants, and records them in static/dist/manifest.json
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import shutil
+
+# rcssmin/rjsmin and brotli are optional (the assets extra: `uv sync --extra
+# assets`) - without them the built-in minifiers are used and only gzip
+# variants are written
+try:
+    import rcssmin
+except ImportError:
+    rcssmin = None
+try:
+    import rjsmin
+except ImportError:
+    rjsmin = None
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+DIST_DIR = os.path.join(STATIC_DIR, 'dist')
+MANIFEST_NAME = 'manifest.json'
+
+# Assets referenced by the templates; css/style1.css is unused and not shipped
+ASSETS = [
+    'css/style.css',
+    'js/main.js',
+]
+
+
+def minify_css(source):
+    if rcssmin is not None:
+        return rcssmin.cssmin(source)
+    source = re.sub(r'/\*.*?\*/', '', source, flags=re.S)
+    source = re.sub(r'\s+', ' ', source)
+    # ':' is left alone - "a :hover" and "a:hover" are different selectors
+    source = re.sub(r'\s*([{};,>])\s*', r'\1', source)
+    return source.replace(';}', '}').strip()
+
+
+def minify_js(source):
+    if rjsmin is not None:
+        return rjsmin.jsmin(source)
+    # Conservative: keep line breaks so automatic semicolon insertion is unaffected
+    lines = (line.strip() for line in source.splitlines())
+    return '\n'.join(line for line in lines if line and not line.startswith('//'))
+
+
+MINIFIERS = {
+    '.css': minify_css,
+    '.js': minify_js,
+}
+
+
+def build_asset(name):
+    with open(os.path.join(STATIC_DIR, name), encoding='utf-8') as f:
+        source = f.read()
+
+    root, extension = os.path.splitext(name)
+    content = MINIFIERS[extension](source).encode('utf-8')
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    hashed_name = f"{root}.{digest}{extension}"
+    output_path = os.path.join(DIST_DIR, hashed_name)
+
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, 'wb') as f:
+        f.write(content)
+    # mtime=0 keeps the gzip output identical between builds
+    with open(output_path + '.gz', 'wb') as f:
+        f.write(gzip.compress(content, compresslevel=9, mtime=0))
+    if brotli is not None:
+        with open(output_path + '.br', 'wb') as f:
+            f.write(brotli.compress(content, quality=11))
+
+    print(f"✅ {name} -> dist/{hashed_name} ({len(source.encode('utf-8'))} -> {len(content)} bytes)")
+    return hashed_name
+
+
+def build():
+    """Rebuild static/dist from scratch and write the manifest"""
+    if os.path.exists(DIST_DIR):
+        shutil.rmtree(DIST_DIR)
+    os.makedirs(DIST_DIR)
+
+    manifest = {name: build_asset(name) for name in ASSETS}
+    with open(os.path.join(DIST_DIR, MANIFEST_NAME), 'w') as f:
+        json.dump(manifest, f, indent=2)
+
+    if brotli is None:
+        print("⚠️  brotli not installed - only gzip variants were written")
+    print(f"\n🎉 Wrote {len(manifest)} assets to static/dist")
+
+
+if __name__ == '__main__':
+    build()
@@ -0,0 +1,187 @@
+from collections import Counter, defaultdict
+from sqlalchemy import func
+from models import db, Course, CourseFile, UserProgress, ArchivedProgress, CompletionBitmap
+from sync import UPSERT_DIALECTS
+
+bitmaps = CompletionBitmap.__table__
+
+
+def to_int(bits):
+    return int.from_bytes(bits, 'little')
+
+
+def to_bytes(value):
+    return value.to_bytes((value.bit_length() + 7) // 8, 'little')
+
+
+def set_bits(bits):
+    """Positions of the set bits"""
+    value = to_int(bits)
+    positions = set()
+    while value:
+        lowest = value & -value
+        positions.add(lowest.bit_length() - 1)
+        value ^= lowest
+    return positions
+
+
+def next_bit_index(course_id):
+    """Bit position for a new file in a course"""
+    # Lock the course so concurrent uploads can't be handed the same position
+    db.session.query(Course.id).filter(Course.id == course_id).with_for_update().scalar()
+    highest = db.session.query(func.max(CourseFile.bit_index)).filter(CourseFile.course_id == course_id).scalar()
+    return 0 if highest is None else highest + 1
+
+
+def index_course_files(course_id):
+    """Give every file of a course that has no bit index one, in course order"""
+    position = next_bit_index(course_id)
+    # Re-read under the course lock: a concurrent request may have indexed them already
+    unindexed = CourseFile.query.filter_by(course_id=course_id, bit_index=None).order_by(
+        CourseFile.order, CourseFile.created_at
+    ).populate_existing().all()
+    for course_file in unindexed:
+        course_file.bit_index = position
+        position += 1
+    db.session.flush()
+
+
+def completed_file_ids(user_id, course_id):
+    """Files of a course a user has progress rows for, hot and archived"""
+    file_ids = {file_id for (file_id,) in db.session.query(UserProgress.file_id).filter(
+        UserProgress.user_id == user_id,
+        UserProgress.course_id == course_id
+    )}
+    for archived in ArchivedProgress.query.filter_by(user_id=user_id, course_id=course_id):
+        file_ids.update(file_id for file_id, *_ in archived.completions)
+    # Archived completions may name files deleted since
+    existing = {file_id for (file_id,) in db.session.query(CourseFile.id).filter(CourseFile.course_id == course_id)}
+    return file_ids & existing
+
+
+def stored_completions(user_id, course_id):
+    """Bitmap value of a user's progress rows in a course"""
+    positions = dict(db.session.query(CourseFile.id, CourseFile.bit_index).filter(
+        CourseFile.course_id == course_id,
+        CourseFile.bit_index.isnot(None)
+    ))
+    value = 0
+    for file_id in completed_file_ids(user_id, course_id):
+        if file_id in positions:
+            value |= 1 << positions[file_id]
+    return value
+
+
+def mark_complete(user_id, course_id, bit_index):
+    """Set a file's bit for a user. Returns False if it was already set"""
+    connection = db.session.connection()
+    # Create the row if needed - seeded from progress recorded before it
+    # existed - then lock it for the read-modify-write
+    exists = db.session.query(CompletionBitmap.user_id).filter_by(user_id=user_id, course_id=course_id).first()
+    if exists is None:
+        connection.execute(
+            UPSERT_DIALECTS[connection.dialect.name].insert(bitmaps).values(
+                user_id=user_id, course_id=course_id, bits=to_bytes(stored_completions(user_id, course_id))
+            ).on_conflict_do_nothing()
+        )
+    bitmap = CompletionBitmap.query.filter_by(user_id=user_id, course_id=course_id).with_for_update().one()
+    value = to_int(bitmap.bits)
+    if value >> bit_index & 1:
+        return False
+    bitmap.bits = to_bytes(value | 1 << bit_index)
+    return True
+
+
+def clear_file(course_id, bit_index):
+    """Clear a deleted file's bit in every bitmap of its course"""
+    for bitmap in CompletionBitmap.query.filter_by(course_id=course_id).with_for_update():
+        value = to_int(bitmap.bits)
+        if value >> bit_index & 1:
+            bitmap.bits = to_bytes(value & ~(1 << bit_index))
+
+
+def completion_counts(user_id):
+    """Completed files per course for one user"""
+    query = db.session.query(CompletionBitmap.course_id, CompletionBitmap.bits).filter(
+        CompletionBitmap.user_id == user_id
+    )
+    counts = {course_id: to_int(bits).bit_count() for course_id, bits in query}
+
+    # Courses with progress from before bitmaps existed, until rebuild_completion_bitmaps() runs
+    started = {course_id for (course_id,) in db.session.query(UserProgress.course_id).filter(
+        UserProgress.user_id == user_id
+    ).distinct()}
+    started.update(course_id for (course_id,) in db.session.query(ArchivedProgress.course_id).filter(
+        ArchivedProgress.user_id == user_id
+    ))
+    for course_id in started - counts.keys():
+        counts[course_id] = len(completed_file_ids(user_id, course_id))
+    return counts
+
+
+def completed_positions(user_id, course_id):
+    """Bit indexes of the files a user has completed in a course"""
+    bits = db.session.query(CompletionBitmap.bits).filter(
+        CompletionBitmap.user_id == user_id,
+        CompletionBitmap.course_id == course_id
+    ).scalar()
+    if bits is None:
+        bits = to_bytes(stored_completions(user_id, course_id))
+    return set_bits(bits)
+
+
+def course_completion(course_id):
+    """Cohort-wide completion of one course: students started and finished, and completions per file"""
+    files = db.session.query(CourseFile.id, CourseFile.bit_index).filter(
+        CourseFile.course_id == course_id,
+        CourseFile.bit_index.isnot(None)
+    ).all()
+    all_files = sum(1 << f.bit_index for f in files)
+
+    per_file = Counter()
+    started = finished = 0
+    query = db.session.query(CompletionBitmap.bits).filter(CompletionBitmap.course_id == course_id)
+    for (bits,) in query.yield_per(1000):
+        value = to_int(bits) & all_files
+        if not value:
+            continue
+        started += 1
+        if value == all_files:
+            finished += 1
+        per_file.update(set_bits(bits))
+
+    return {
+        'students_started': started,
+        'students_finished': finished,
+        'files': {f.id: per_file[f.bit_index] for f in files}
+    }
+
+
+def rebuild_completion_bitmaps():
+    """Give every file a bit index and rebuild all bitmaps from the progress rows, hot and archived.
+
+    Returns the number of bitmaps written.
+    """
+    unindexed = db.session.query(CourseFile.course_id).filter(CourseFile.bit_index.is_(None)).distinct().all()
+    for (course_id,) in unindexed:
+        index_course_files(course_id)
+
+    positions = dict(db.session.query(CourseFile.id, CourseFile.bit_index))
+    values = defaultdict(int)
+    progress = db.session.query(UserProgress.user_id, UserProgress.course_id, UserProgress.file_id)
+    for user_id, course_id, file_id in progress.yield_per(5000):
+        if file_id in positions:
+            values[(user_id, course_id)] |= 1 << positions[file_id]
+    for archived in ArchivedProgress.query.yield_per(500):
+        for file_id, *_ in archived.completions:
+            if file_id in positions:
+                values[(archived.user_id, archived.course_id)] |= 1 << positions[file_id]
+
+    CompletionBitmap.query.delete()
+    if values:
+        db.session.execute(bitmaps.insert(), [
+            {'user_id': user_id, 'course_id': course_id, 'bits': to_bytes(value)}
+            for (user_id, course_id), value in values.items()
+        ])
+    db.session.commit()
+    return len(values)
@@ -0,0 +1,161 @@
+import asyncio
+import json
+import queue
+import select
+import threading
+import time
+from flask import current_app
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+from models import db
+
+# PostgreSQL NOTIFY channel shared by every app process
+CHANNEL = 'admin_events'
+# NOTIFY payloads must stay under 8000 bytes
+NOTIFY_PAYLOAD_LIMIT = 7900
+
+
+class EventBroker:
+    """Fan-out of admin events to server-sent event streams.
+
+    On PostgreSQL events are sent with NOTIFY inside the writing transaction,
+    so they are only delivered once it commits and reach every app process
+    through a LISTEN thread. Other databases (SQLite in development) use an
+    in-process queue flushed after each commit. Events carry ids and stat
+    deltas, not row contents - subscribers look rows up themselves.
+    """
+
+    def __init__(self, app=None):
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self._listener = None
+        self.app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        event.listen(db.session, 'after_commit', self._flush_pending)
+        event.listen(db.session, 'after_rollback', self._discard_pending)
+
+    def uses_notify(self):
+        engine = db.engine
+        return engine.dialect.name == 'postgresql' and engine.driver == 'psycopg2'
+
+    def publish(self, event_type, data=None, stats=None):
+        """Queue an event on the current transaction; it is delivered on commit"""
+        payload = {'type': event_type, 'data': data or {}, 'stats': stats or {}}
+        if self.uses_notify():
+            self._notify(payload)
+        else:
+            db.session.info.setdefault('pending_events', []).append(payload)
+
+    def _notify(self, payload):
+        message = self.app.json.dumps(payload)
+        if len(message.encode('utf-8')) > NOTIFY_PAYLOAD_LIMIT:
+            # Subscribers still get the type and stat deltas and re-fetch the rest
+            message = self.app.json.dumps(dict(payload, data={}))
+        # Flush first so errors in the write itself are not mistaken for a failed notify
+        db.session.flush()
+        try:
+            with db.session.begin_nested():
+                db.session.execute(
+                    text('SELECT pg_notify(:channel, :payload)'),
+                    {'channel': CHANNEL, 'payload': message}
+                )
+        except SQLAlchemyError as e:
+            # A lost event only costs admins a refresh; it must never fail the write
+            print(f"Admin event {payload['type']} not sent: {e}")
+
+    def subscribe(self):
+        if self.uses_notify():
+            self._ensure_listener()
+        subscriber = queue.Queue(maxsize=100)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def subscribe_async(self):
+        """Subscribe from an asyncio event loop; returns an object with an asyncio .queue"""
+        if self.uses_notify():
+            self._ensure_listener()
+        subscriber = AsyncSubscriber(asyncio.get_running_loop())
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def _dispatch(self, payload):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.put_nowait(payload)
+            except queue.Full:
+                # Slow client - drop the event rather than block the writer
+                pass
+
+    def _flush_pending(self, session):
+        for payload in session.info.pop('pending_events', []):
+            self._dispatch(payload)
+
+    def _discard_pending(self, session):
+        session.info.pop('pending_events', None)
+
+    def _ensure_listener(self):
+        with self._lock:
+            if self._listener is not None and self._listener.is_alive():
+                return
+            self._listener = threading.Thread(target=self._listen, name='admin-events-listener', daemon=True)
+            self._listener.start()
+
+    def _listen(self):
+        while True:
+            try:
+                with self.app.app_context():
+                    connection = db.engine.raw_connection()
+                try:
+                    driver_connection = connection.driver_connection
+                    driver_connection.autocommit = True
+                    with driver_connection.cursor() as cursor:
+                        cursor.execute(f'LISTEN {CHANNEL}')
+                    while True:
+                        if select.select([driver_connection], [], [], 30) == ([], [], []):
+                            continue
+                        driver_connection.poll()
+                        while driver_connection.notifies:
+                            notify = driver_connection.notifies.pop(0)
+                            self._dispatch(json.loads(notify.payload))
+                finally:
+                    connection.invalidate()
+            except Exception as e:
+                print(f"Admin event listener error: {e}")
+                time.sleep(1)
+
+
+class AsyncSubscriber:
+    """Hands events published from worker threads to an asyncio queue"""
+
+    def __init__(self, loop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=100)
+
+    def put_nowait(self, payload):
+        self.loop.call_soon_threadsafe(self._put, payload)
+
+    def _put(self, payload):
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            pass
+
+
+broker = EventBroker()
+
+
+def format_sse(payload):
+    """Encode an event payload as a text/event-stream message"""
+    return f"event: {payload['type']}\ndata: {current_app.json.dumps(payload)}\n\n"
@@ -0,0 +1,146 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from flask import current_app
+from jinja2 import nodes
+from jinja2.ext import Extension
+from markupsafe import Markup
+
+# redis is optional (the redis extra) - without it fragments are only cached per process
+try:
+    import redis
+except ImportError:
+    redis = None
+
+
+class LRUCache:
+    """Bounded in-memory cache that evicts the least recently used entry"""
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is not None:
+                self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class FragmentCache:
+    """Caches rendered template fragments keyed by version stamps.
+
+    Keys include the updated_at of the rows a fragment shows, so edits
+    produce a new key instead of needing invalidation; stale entries simply
+    age out of the LRU (or expire from the shared backend). Keys are also
+    prefixed with a version - FRAGMENT_CACHE_VERSION (e.g. the release hash)
+    or a hash of the templates - so a deploy that changes markup doesn't
+    serve fragments rendered by the previous one. Nothing is cached while
+    templates auto-reload, as they do in development.
+    """
+
+    def __init__(self, app=None):
+        self.local = None
+        self.shared = None
+        self.timeout = None
+        self.version = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.local = LRUCache(app.config.get('FRAGMENT_CACHE_SIZE', 1024))
+        self.timeout = app.config.get('FRAGMENT_CACHE_TIMEOUT', 24 * 60 * 60)
+        self.version = app.config.get('FRAGMENT_CACHE_VERSION') or templates_version(app)
+        url = app.config.get('FRAGMENT_CACHE_URL')
+        if url and redis is not None:
+            self.shared = redis.Redis.from_url(url)
+        app.jinja_env.add_extension(FragmentCacheExtension)
+        app.jinja_env.fragment_cache = self
+
+    def get_or_render(self, key_parts, render):
+        # Templates reload from disk in development (debug or TEMPLATES_AUTO_RELOAD),
+        # which the version hashed at startup can't follow. Checked per render
+        # because app.run(debug=True) turns debug on after init_app
+        if current_app.jinja_env.auto_reload:
+            return render()
+
+        key = f'fragment:{self.version}:' + ':'.join(str(part) for part in key_parts)
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        if self.shared is not None:
+            try:
+                cached = self.shared.get(key)
+            except redis.RedisError:
+                cached = None
+            if cached is not None:
+                value = cached.decode('utf-8')
+                self.local.set(key, value)
+                return value
+
+        value = str(render())
+        self.local.set(key, value)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, value.encode('utf-8'), ex=self.timeout)
+            except redis.RedisError:
+                pass
+        return value
+
+
+def templates_version(app):
+    """Short hash of the template sources, the same on every node running one release"""
+    digest = hashlib.sha256()
+    folder = os.path.join(app.root_path, app.template_folder or 'templates')
+    for root, dirs, files in os.walk(folder):
+        dirs.sort()
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            digest.update(os.path.relpath(path, folder).encode('utf-8'))
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+    return digest.hexdigest()[:12]
+
+
+class FragmentCacheExtension(Extension):
+    """Adds {% cache 'name', stamp, ... %}...{% endcache %} to templates"""
+
+    tags = {'cache'}
+
+    def __init__(self, environment):
+        super().__init__(environment)
+        environment.extend(fragment_cache=None)
+
+    def parse(self, parser):
+        lineno = next(parser.stream).lineno
+        key_parts = [parser.parse_expression()]
+        while parser.stream.skip_if('comma'):
+            key_parts.append(parser.parse_expression())
+        body = parser.parse_statements(['name:endcache'], drop_needle=True)
+        return nodes.CallBlock(
+            self.call_method('_render', [nodes.List(key_parts)]), [], [], body
+        ).set_lineno(lineno)
+
+    def _render(self, key_parts, caller):
+        cache = self.environment.fragment_cache
+        if cache is None:
+            return caller()
+        return Markup(cache.get_or_render(key_parts, caller))
+
+
+fragment_cache = FragmentCache()
@@ -8,14 +8,54 @@ import os
 import sys
 from werkzeug.security import generate_password_hash
 from datetime import datetime
+from sqlalchemy import inspect, text
 import uuid
 
 # Add the current directory to Python path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
 from app import app, db
+from search import create_search_index
+from archive import create_partitions
+from completion import rebuild_completion_bitmaps
 from models import User, Course, CourseFile
 
+# Columns added to tables that already existed: (table, column, definition,
+# column to backfill from). db.create_all() only creates missing tables.
+ADDED_COLUMNS = [
+    # Upload checksums
+    ('course_files', 'checksum', 'VARCHAR(64)', None),
+    ('course_submissions', 'checksum', 'VARCHAR(64)', None),
+    # Fragment cache version stamps
+    ('course_files', 'updated_at', 'TIMESTAMP', 'created_at'),
+    # Delta sync change sequences and the tombstone pruning floor
+    ('user_progress', 'change_seq', 'INTEGER NOT NULL DEFAULT 0', None),
+    ('course_submissions', 'change_seq', 'INTEGER NOT NULL DEFAULT 0', None),
+    ('sync_cursors', 'floor', 'INTEGER NOT NULL DEFAULT 0', None),
+    # Completion bitmap positions, assigned lazily to existing files
+    ('course_files', 'bit_index', 'INTEGER', None),
+]
+
+def upgrade_schema():
+    """Add missing columns and indexes to existing tables. Safe to run repeatedly"""
+    added = []
+    with db.engine.begin() as connection:
+        inspector = inspect(connection)
+        for table, column, definition, backfill in ADDED_COLUMNS:
+            if column in {c['name'] for c in inspector.get_columns(table)}:
+                continue
+            connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {column} {definition}"))
+            if backfill:
+                connection.execute(text(f"UPDATE {table} SET {column} = {backfill}"))
+                # SQLite can't add NOT NULL to an existing column; the model default covers new rows
+                if connection.dialect.name == 'postgresql':
+                    connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} SET NOT NULL"))
+            added.append(f"{table}.{column}")
+        for table in {table for table, _, _, _ in ADDED_COLUMNS}:
+            for index in db.metadata.tables[table].indexes:
+                index.create(connection, checkfirst=True)
+    return added
+
 def init_database():
     """Initialize the database with sample data"""
     with app.app_context():
@@ -23,6 +63,15 @@ def init_database():
         db.create_all()
         print("✅ Database tables created")
         
+        for column in upgrade_schema():
+            print(f"✅ Added column {column}")
+        
+        create_partitions()
+        print("✅ History partitions created")
+        
+        create_search_index()
+        print("✅ Search index created")
+        
         # Check if admin user exists
         admin_user = User.query.filter_by(email='admin@seedsowers.org').first()
         if not admin_user:
@@ -116,6 +165,9 @@ def init_database():
         
         # Commit all changes
         db.session.commit()
+        
+        bitmaps = rebuild_completion_bitmaps()
+        print(f"✅ Completion bitmaps rebuilt ({bitmaps} user/course pairs)")
         print("\n🎉 Database initialization completed successfully!")
         print("\nLogin Credentials:")
         print("Admin: admin@seedsowers.org / admin123")
@@ -67,9 +67,12 @@ class CourseFile(db.Model):
     file_type = db.Column(db.Enum('audio', 'video', 'pdf', name='file_type'), nullable=False)
     file_path = db.Column(db.String(500), nullable=False)
     file_size = db.Column(db.Integer, nullable=True)  # in bytes
+    checksum = db.Column(db.String(64), nullable=True)  # SHA-256 of the stored file
     duration = db.Column(db.String(50), nullable=True)  # for audio/video files
     order = db.Column(db.Integer, nullable=False)  # order within course
+    bit_index = db.Column(db.Integer, nullable=True)  # position in CompletionBitmap.bits, stable across reordering
     created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
     # Relationships
     user_progress = db.relationship('UserProgress', backref='file', lazy=True, cascade='all, delete-orphan')
@@ -93,6 +96,9 @@ class UserProgress(db.Model):
     course_id = db.Column(db.String(36), db.ForeignKey('courses.id'), nullable=False)
     file_id = db.Column(db.String(36), db.ForeignKey('course_files.id'), nullable=False)
     completed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    change_seq = db.Column(db.Integer, default=0, nullable=False)  # owner's sync cursor at last change
+    
+    __table_args__ = (db.Index('ix_user_progress_user_change', 'user_id', 'change_seq'),)
     
     def __repr__(self):
         return f'<UserProgress {self.user_id}:{self.file_id}>'
@@ -106,6 +112,7 @@ class CourseSubmission(db.Model):
     file_path = db.Column(db.String(500), nullable=False)
     file_name = db.Column(db.String(255), nullable=False)
     file_size = db.Column(db.Integer, nullable=True)
+    checksum = db.Column(db.String(64), nullable=True)  # SHA-256 of the stored file
     comments = db.Column(db.Text, nullable=True)
     status = db.Column(db.Enum('pending', 'approved', 'rejected', name='submission_status'), 
                       default='pending', nullable=False)
@@ -113,6 +120,9 @@ class CourseSubmission(db.Model):
     review_comments = db.Column(db.Text, nullable=True)
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
     reviewed_at = db.Column(db.DateTime, nullable=True)
+    change_seq = db.Column(db.Integer, default=0, nullable=False)  # owner's sync cursor at last change
+    
+    __table_args__ = (db.Index('ix_course_submissions_user_change', 'user_id', 'change_seq'),)
     
     def __repr__(self):
         return f'<CourseSubmission {self.file_name}>'
@@ -125,6 +135,91 @@ class CourseSubmission(db.Model):
         }
         return status_classes.get(self.status, 'badge-secondary')
 
+# Compact completion state: bit n of bits is set when the user has completed
+# the course file whose bit_index is n (see completion.py)
+class CompletionBitmap(db.Model):
+    __tablename__ = 'completion_bitmaps'
+    
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    course_id = db.Column(db.String(36), db.ForeignKey('courses.id'), primary_key=True, index=True)
+    bits = db.Column(db.LargeBinary, nullable=False, default=b'')
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    def __repr__(self):
+        return f'<CompletionBitmap {self.user_id}:{self.course_id}>'
+
+# Cold storage for finished cohorts, written by archive_data.py. A cohort is
+# one student's run through one course; its progress rows are packed into a
+# single row and its submissions keep their own rows with gzipped files.
+class ArchivedProgress(db.Model):
+    __tablename__ = 'user_progress_archive'
+    
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid4()))
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    course_id = db.Column(db.String(36), db.ForeignKey('courses.id'), nullable=False)
+    completions = db.Column(db.JSON, nullable=False)  # [[file_id, completed_at ISO 8601, progress id], ...]
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    course = db.relationship('Course')
+    
+    def __repr__(self):
+        return f'<ArchivedProgress {self.user_id}:{self.course_id}>'
+
+class ArchivedSubmission(db.Model):
+    __tablename__ = 'course_submissions_archive'
+    
+    id = db.Column(db.String(36), primary_key=True)
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=False, index=True)
+    course_id = db.Column(db.String(36), db.ForeignKey('courses.id'), nullable=False)
+    file_path = db.Column(db.String(500), nullable=False)  # gzipped copy under archive/
+    file_name = db.Column(db.String(255), nullable=False)
+    file_size = db.Column(db.Integer, nullable=True)  # size before compression
+    checksum = db.Column(db.String(64), nullable=True)  # SHA-256 before compression
+    comments = db.Column(db.Text, nullable=True)
+    status = db.Column(db.String(20), nullable=False)
+    reviewed_by = db.Column(db.String(36), db.ForeignKey('users.id'), nullable=True)
+    review_comments = db.Column(db.Text, nullable=True)
+    submitted_at = db.Column(db.DateTime, nullable=False)
+    reviewed_at = db.Column(db.DateTime, nullable=True)
+    archived_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    course = db.relationship('Course')
+    reviewer = db.relationship('User', foreign_keys=[reviewed_by])
+    
+    def __repr__(self):
+        return f'<ArchivedSubmission {self.file_name}>'
+    
+    get_status_badge_class = CourseSubmission.get_status_badge_class
+
+# Delta sync state (see sync.py). Every change to a user's progress or
+# submissions advances their cursor; deleted rows leave a tombstone until
+# prune_tombstones() removes it.
+class SyncCursor(db.Model):
+    __tablename__ = 'sync_cursors'
+    
+    user_id = db.Column(db.String(36), db.ForeignKey('users.id'), primary_key=True)
+    seq = db.Column(db.Integer, default=0, nullable=False)
+    floor = db.Column(db.Integer, default=0, nullable=False)  # tombstones at or below this seq were pruned
+    
+    def __repr__(self):
+        return f'<SyncCursor {self.user_id}:{self.seq}>'
+
+class SyncTombstone(db.Model):
+    __tablename__ = 'sync_tombstones'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.String(36), nullable=False)
+    kind = db.Column(db.String(20), nullable=False)  # progress, submission
+    row_id = db.Column(db.String(36), nullable=False)
+    course_id = db.Column(db.String(36), nullable=False)
+    seq = db.Column(db.Integer, nullable=False)
+    deleted_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    
+    __table_args__ = (db.Index('ix_sync_tombstones_user_seq', 'user_id', 'seq'),)
+    
+    def __repr__(self):
+        return f'<SyncTombstone {self.kind}:{self.row_id}>'
+
 # Session storage for Flask sessions (equivalent to sessions table)
 class SessionStorage(db.Model):
     __tablename__ = 'sessions'
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+Upload storage integrity scanner for Seedsowers Ministry
+Compares the files under UPLOAD_FOLDER with the paths recorded in the
+database and reports (or removes) orphaned files and missing files
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the current directory to Python path
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from app import app, db, storage
+from models import CourseFile, CourseSubmission, ArchivedSubmission
+
+CHECKPOINT_NAME = '.scan-checkpoint.json'
+INCOMING_DIR = '.incoming'
+
+
+def load_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {'directories': {}}
+
+
+def save_checkpoint(path, checkpoint):
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w') as f:
+        json.dump(checkpoint, f)
+    os.replace(temp_path, path)
+
+
+def list_directory(path, cached):
+    """List one directory, reusing the cached listing if its mtime hasn't changed.
+
+    A directory's mtime only changes when entries are added, removed or
+    renamed directly inside it, so unchanged directories need no scandir.
+    """
+    mtime = os.stat(path).st_mtime
+    if cached and cached['mtime'] == mtime:
+        return path, cached, False
+
+    files = {}
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            if entry.is_dir(follow_symlinks=False):
+                subdirs.append(entry.name)
+            elif entry.is_file(follow_symlinks=False):
+                files[entry.name] = entry.stat(follow_symlinks=False).st_mtime
+    return path, {'mtime': mtime, 'files': files, 'subdirs': subdirs}, True
+
+
+def walk_uploads(root, checkpoint, workers):
+    """Walk the upload tree breadth-first, scanning each level's directories in parallel"""
+    previous = checkpoint['directories']
+    listings = {}
+    rescanned = 0
+    frontier = [root]
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        while frontier:
+            results = executor.map(lambda d: list_directory(d, previous.get(d)), frontier)
+            frontier = []
+            for path, listing, changed in results:
+                listings[path] = listing
+                rescanned += changed
+                frontier.extend(os.path.join(path, name) for name in listing['subdirs'])
+
+    on_disk = {}
+    for path, listing in listings.items():
+        for name, mtime in listing['files'].items():
+            on_disk[os.path.normpath(os.path.join(path, name))] = mtime
+    on_disk.pop(os.path.normpath(os.path.join(root, CHECKPOINT_NAME)), None)
+
+    checkpoint['directories'] = listings
+    return on_disk, rescanned
+
+
+def recorded_paths(root):
+    """All file paths referenced by the database, as one set.
+
+    New rows store keys relative to the upload folder, older rows absolute paths.
+    """
+    paths = set()
+    for model in (CourseFile, CourseSubmission, ArchivedSubmission):
+        paths.update(os.path.normpath(os.path.join(root, p)) for (p,) in db.session.query(model.file_path))
+    return paths
+
+
+def scan(delete=False, full=False, workers=8, grace_minutes=60):
+    """Run one scan and return (orphans, missing)"""
+    if not storage.local:
+        print(f"❌ Scanning is only supported for local storage (STORAGE_BACKEND={app.config['STORAGE_BACKEND']})")
+        return [], []
+
+    with app.app_context():
+        root = storage.root
+        checkpoint_path = os.path.join(root, CHECKPOINT_NAME)
+        checkpoint = {'directories': {}} if full else load_checkpoint(checkpoint_path)
+
+        started = time.time()
+        on_disk, rescanned = walk_uploads(root, checkpoint, workers)
+        in_db = recorded_paths(root)
+
+        # Files written moments ago may belong to an upload whose row isn't committed yet
+        cutoff = started - grace_minutes * 60
+        orphans = sorted(p for p in on_disk.keys() - in_db if on_disk[p] < cutoff)
+        missing = sorted(p for p in in_db - on_disk.keys() if p.startswith(root + os.sep))
+        outside = len([p for p in in_db if not p.startswith(root + os.sep)])
+
+        print(f"📂 Scanned {len(checkpoint['directories'])} directories ({rescanned} changed since last scan), {len(on_disk)} files")
+        if outside:
+            print(f"⚠️  {outside} database paths point outside {root} and were not checked")
+
+        for path in orphans:
+            label = 'stale upload' if os.sep + INCOMING_DIR + os.sep in path else 'orphan'
+            if delete:
+                try:
+                    os.remove(path)
+                    # Its directory listing is out of date now
+                    checkpoint['directories'].pop(os.path.dirname(path), None)
+                    print(f"🗑️  Removed {label}: {path}")
+                except OSError as e:
+                    print(f"❌ Could not remove {path}: {e}")
+            else:
+                print(f"❓ {label.capitalize()}: {path}")
+
+        for path in missing:
+            print(f"❌ Missing file: {path}")
+
+        save_checkpoint(checkpoint_path, checkpoint)
+        print(f"\n{len(orphans)} orphaned, {len(missing)} missing ({time.time() - started:.2f}s)")
+        return orphans, missing
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Check uploaded files against the database')
+    parser.add_argument('--delete', action='store_true', help='remove orphaned files instead of only reporting them')
+    parser.add_argument('--full', action='store_true', help='ignore the checkpoint and rescan every directory')
+    parser.add_argument('--workers', type=int, default=8, help='directories scanned in parallel')
+    parser.add_argument('--grace', type=int, default=60, help='minutes before a new unreferenced file counts as orphaned')
+    parser.add_argument('--interval', type=int, default=0, help='keep running, rescanning every N seconds')
+    args = parser.parse_args()
+
+    while True:
+        orphans, missing = scan(args.delete, args.full, args.workers, args.grace)
+        if not args.interval:
+            sys.exit(1 if missing or (orphans and not args.delete) else 0)
+        time.sleep(args.interval)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+import re
+from sqlalchemy import text
+from sqlalchemy.exc import SQLAlchemyError
+from models import db
+
+# Searchable tables. 'columns' are indexed; 'title'/'subtitle'/'course_id' are
+# SQL expressions over the row (aliased t) returned with each hit.
+SEARCH_TARGETS = {
+    'user': {
+        'table': 'users',
+        'columns': ['first_name', 'last_name', 'email'],
+        'title': "trim(coalesce(t.first_name, '') || ' ' || coalesce(t.last_name, ''))",
+        'subtitle': 't.email',
+        'course_id': 'NULL',
+        'admin_only': True,
+    },
+    'course': {
+        'table': 'courses',
+        'columns': ['title', 'description'],
+        'title': 't.title',
+        'subtitle': 't.description',
+        'course_id': 't.id',
+        'student_filter': 't.is_active',
+    },
+    'course_file': {
+        'table': 'course_files',
+        'columns': ['title', 'description'],
+        'title': 't.title',
+        'subtitle': 't.description',
+        'course_id': 't.course_id',
+        'student_filter': 't.course_id IN (SELECT id FROM courses WHERE is_active)',
+    },
+    'submission': {
+        'table': 'course_submissions',
+        'columns': ['file_name', 'comments'],
+        'title': 't.file_name',
+        'subtitle': 't.comments',
+        'course_id': 't.course_id',
+        'admin_only': True,
+    },
+}
+
+
+def _is_postgres():
+    return db.engine.dialect.name == 'postgresql'
+
+
+def _tsvector(columns, prefix=''):
+    document = " || ' ' || ".join(f"coalesce({prefix}{c}, '')" for c in columns)
+    return f"to_tsvector('simple', {document})"
+
+
+class SearchUnavailable(Exception):
+    """Raised when the search index is missing and can't be created"""
+
+
+# Set once this process has seen (or built) the SQLite index
+_index_ready = False
+
+
+def create_search_index():
+    """Create the full-text index structures for the current database.
+
+    PostgreSQL uses GIN indexes over tsvector expressions, which the database
+    maintains itself. SQLite uses one FTS5 table per target, kept in sync by
+    triggers on the source table, so every write path (including bulk
+    UPDATE/DELETE statements) updates the index. Source tables have text
+    primary keys and implicit rowids, which VACUUM may renumber, so FTS rows
+    are keyed through a {table}_fts_keys table with an explicit INTEGER key.
+    """
+    global _index_ready
+    with db.engine.begin() as connection:
+        for target in SEARCH_TARGETS.values():
+            table = target['table']
+            columns = target['columns']
+            if _is_postgres():
+                connection.execute(text(
+                    f"CREATE INDEX IF NOT EXISTS ix_{table}_search ON {table} "
+                    f"USING GIN (({_tsvector(columns)}))"
+                ))
+                continue
+
+            fts = f"{table}_fts"
+            keys = f"{fts}_keys"
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"), {'name': keys}
+            ).first()
+            if exists:
+                continue
+
+            # Replaces the earlier index keyed on the source table's rowid
+            for trigger in ('ai', 'ad', 'au'):
+                connection.execute(text(f"DROP TRIGGER IF EXISTS {fts}_{trigger}"))
+            connection.execute(text(f"DROP TABLE IF EXISTS {fts}"))
+
+            column_list = ', '.join(columns)
+            new_values = ', '.join(f'new.{c}' for c in columns)
+            new_key = f"(SELECT rowid FROM {keys} WHERE id = new.id)"
+            old_key = f"(SELECT rowid FROM {keys} WHERE id = old.id)"
+            connection.execute(text(f"CREATE TABLE {keys} (rowid INTEGER PRIMARY KEY, id VARCHAR(36) NOT NULL UNIQUE)"))
+            connection.execute(text(
+                f"CREATE VIRTUAL TABLE {fts} USING fts5({column_list}, "
+                f"tokenize='unicode61 remove_diacritics 2')"
+            ))
+            connection.execute(text(
+                f"CREATE TRIGGER {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {keys}(id) VALUES (new.id); "
+                f"INSERT INTO {fts}(rowid, {column_list}) VALUES ({new_key}, {new_values}); END"
+            ))
+            connection.execute(text(
+                f"CREATE TRIGGER {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"DELETE FROM {fts} WHERE rowid = {old_key}; "
+                f"DELETE FROM {keys} WHERE id = old.id; END"
+            ))
+            connection.execute(text(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE ON {table} BEGIN "
+                f"DELETE FROM {fts} WHERE rowid = {old_key}; "
+                f"UPDATE {keys} SET id = new.id WHERE id = old.id; "
+                f"INSERT INTO {fts}(rowid, {column_list}) VALUES ({new_key}, {new_values}); END"
+            ))
+            # Index the rows that existed before the table was created
+            connection.execute(text(f"INSERT INTO {keys}(id) SELECT id FROM {table}"))
+            connection.execute(text(
+                f"INSERT INTO {fts}(rowid, {column_list}) "
+                f"SELECT k.rowid, {', '.join(f't.{c}' for c in columns)} FROM {table} t JOIN {keys} k ON k.id = t.id"
+            ))
+    _index_ready = True
+
+
+def ensure_search_index():
+    """Build the SQLite index on first use if this database doesn't have it yet.
+
+    PostgreSQL needs nothing here: without the GIN indexes queries still
+    work, just more slowly.
+    """
+    global _index_ready
+    if _index_ready or _is_postgres():
+        return
+    missing = [
+        target['table'] for target in SEARCH_TARGETS.values()
+        if not db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+            {'name': f"{target['table']}_fts_keys"}
+        ).first()
+    ]
+    if missing:
+        try:
+            create_search_index()
+        except SQLAlchemyError as e:
+            raise SearchUnavailable(f"Search index could not be created: {e}") from e
+    _index_ready = True
+
+
+def _terms(query):
+    # Only word characters reach the query syntax; every term is a prefix match
+    return re.findall(r'\w+', query.lower())[:10]
+
+
+def _target_query(kind, target, is_admin):
+    columns = target['columns']
+    fields = f"'{kind}' AS type, t.id AS id, {target['title']} AS title, " \
+             f"{target['subtitle']} AS subtitle, {target['course_id']} AS course_id"
+    if _is_postgres():
+        vector = _tsvector(columns, 't.')
+        sql = (f"SELECT {fields}, ts_rank({vector}, to_tsquery('simple', :q)) AS rank "
+               f"FROM {target['table']} t WHERE {vector} @@ to_tsquery('simple', :q)")
+    else:
+        fts = f"{target['table']}_fts"
+        # bm25() is lower-is-better; negate it so both backends sort rank descending
+        sql = (f"SELECT {fields}, -bm25({fts}) AS rank FROM {fts} "
+               f"JOIN {fts}_keys k ON k.rowid = {fts}.rowid "
+               f"JOIN {target['table']} t ON t.id = k.id WHERE {fts} MATCH :q")
+    if not is_admin and target.get('student_filter'):
+        sql += f" AND {target['student_filter']}"
+    return sql
+
+
+def search(query, types=None, is_admin=False, page=1, per_page=20):
+    """Ranked search across the requested types. Returns (hits, has_more)"""
+    terms = _terms(query)
+    if not terms:
+        return [], False
+
+    kinds = [
+        kind for kind, target in SEARCH_TARGETS.items()
+        if (not types or kind in types) and (is_admin or not target.get('admin_only'))
+    ]
+    if not kinds:
+        return [], False
+    ensure_search_index()
+
+    if _is_postgres():
+        q = ' & '.join(f'{term}:*' for term in terms)
+    else:
+        q = ' '.join(f'"{term}"*' for term in terms)
+
+    sql = ' UNION ALL '.join(_target_query(kind, SEARCH_TARGETS[kind], is_admin) for kind in kinds)
+    sql = f"SELECT * FROM ({sql}) hits ORDER BY rank DESC LIMIT :limit OFFSET :offset"
+    # One extra row tells us whether there is a next page without counting every match
+    result = db.session.execute(text(sql), {
+        'q': q, 'limit': per_page + 1, 'offset': (page - 1) * per_page
+    })
+    hits = [dict(row._mapping) for row in result]
+    return hits[:per_page], len(hits) > per_page
@@ -0,0 +1,94 @@
+from datetime import date, datetime
+from flask.json.provider import DefaultJSONProvider
+from sqlalchemy import func
+from models import db, User, Course, CourseFile, UserProgress, CourseSubmission, ArchivedSubmission
+
+# orjson is optional (the fast-json extra) - fall back to the stdlib encoder when it isn't installed
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class AppJSONProvider(DefaultJSONProvider):
+    """JSON provider that encodes datetimes as ISO 8601 and uses orjson when available"""
+
+    @staticmethod
+    def default(o):
+        if isinstance(o, (datetime, date)):
+            return o.isoformat()
+        return DefaultJSONProvider.default(o)
+
+    def dumps(self, obj, **kwargs):
+        if orjson is not None and not kwargs.get('indent'):
+            return orjson.dumps(
+                obj,
+                default=self.default,
+                option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+            ).decode('utf-8')
+        kwargs.setdefault('default', self.default)
+        return super().dumps(obj, **kwargs)
+
+
+# Field projections for each model - one tuple of columns per API shape
+COURSE_FIELDS = (
+    Course.id, Course.title, Course.description,
+    Course.duration, Course.order, Course.is_active
+)
+
+COURSE_FILE_FIELDS = (
+    CourseFile.id, CourseFile.title, CourseFile.description, CourseFile.file_type,
+    CourseFile.file_path, CourseFile.file_size, CourseFile.duration, CourseFile.order
+)
+
+PROJECTIONS = {
+    'course': COURSE_FIELDS,
+    'course_admin': COURSE_FIELDS + (Course.created_at,),
+    'course_file': COURSE_FILE_FIELDS,
+    'course_file_admin': COURSE_FILE_FIELDS + (CourseFile.created_at,),
+    'user_admin': (
+        User.id, User.email, User.first_name, User.last_name,
+        User.role, User.is_active, User.created_at
+    ),
+    'progress': (
+        UserProgress.id, UserProgress.course_id,
+        UserProgress.file_id, UserProgress.completed_at
+    ),
+    'submission': (
+        CourseSubmission.id, CourseSubmission.course_id, CourseSubmission.file_name,
+        CourseSubmission.file_path, CourseSubmission.file_size, CourseSubmission.comments,
+        CourseSubmission.status, CourseSubmission.review_comments,
+        CourseSubmission.submitted_at, CourseSubmission.reviewed_at
+    ),
+    # Same shape as 'submission', for cohorts moved to cold storage
+    'archived_submission': (
+        ArchivedSubmission.id, ArchivedSubmission.course_id, ArchivedSubmission.file_name,
+        ArchivedSubmission.file_path, ArchivedSubmission.file_size, ArchivedSubmission.comments,
+        ArchivedSubmission.status, ArchivedSubmission.review_comments,
+        ArchivedSubmission.submitted_at, ArchivedSubmission.reviewed_at
+    ),
+    # Joined with User and Course by the caller
+    'pending_submission': (
+        CourseSubmission.id, CourseSubmission.file_name,
+        Course.title.label('course_title'),
+        func.trim(
+            func.coalesce(User.first_name, '') + ' ' + func.coalesce(User.last_name, '')
+        ).label('student_name'),
+        CourseSubmission.submitted_at, CourseSubmission.comments
+    ),
+}
+
+
+def select(projection):
+    """Start a query that loads only the columns of a projection"""
+    return db.session.query(*PROJECTIONS[projection])
+
+
+def rows(query):
+    """Turn a projected query into a list of plain dicts"""
+    return [row._asdict() for row in query]
+
+
+def one_or_404(query):
+    """Return a single projected row as a dict, aborting with 404 if missing"""
+    return query.first_or_404()._asdict()
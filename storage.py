@@ -0,0 +1,209 @@
+import os
+import shutil
+import tempfile
+from flask import url_for
+from werkzeug.wsgi import LimitedStream
+
+# Chunk size used when copying streams and for S3 multipart parts
+CHUNK_SIZE = 8 * 1024 * 1024
+
+# Mode open() would give a new file under the process umask. Temp files from
+# mkstemp are 0600, which the web server or a backup job couldn't read
+_umask = os.umask(0)
+os.umask(_umask)
+FILE_MODE = 0o666 & ~_umask
+
+
+class StorageBackend:
+    """Where uploaded media lives.
+
+    Files are addressed by keys relative to the upload root, e.g.
+    "course-files/<course_id>/audio/<name>.mp3". Older rows store absolute
+    local paths; key_for() turns those into keys.
+    """
+
+    # True when files can be served straight from this node's disk
+    local = False
+
+    def __init__(self, root):
+        self.root = os.path.normpath(root)
+
+    def key_for(self, path):
+        if os.path.isabs(path):
+            path = os.path.relpath(os.path.normpath(path), self.root)
+        return path.replace(os.sep, '/')
+
+    def put_stream(self, key, stream, content_type=None):
+        raise NotImplementedError
+
+    def put_file(self, key, path, content_type=None):
+        """Store a local file, consuming it (the source path is gone afterwards)"""
+        raise NotImplementedError
+
+    def open_range(self, key, start=0, end=None):
+        """Readable binary stream of bytes start..end (inclusive) of a stored file"""
+        raise NotImplementedError
+
+    def exists(self, key):
+        raise NotImplementedError
+
+    def delete(self, key):
+        raise NotImplementedError
+
+    def move(self, src_key, dst_key):
+        raise NotImplementedError
+
+    def url(self, key):
+        raise NotImplementedError
+
+
+class LocalStorage(StorageBackend):
+    """Files under UPLOAD_FOLDER on this node's filesystem"""
+
+    local = True
+
+    def path_for(self, key):
+        path = os.path.normpath(os.path.join(self.root, self.key_for(key)))
+        if not path.startswith(self.root + os.sep):
+            raise ValueError(f'Storage key escapes upload folder: {key}')
+        return path
+
+    def put_stream(self, key, stream, content_type=None):
+        path = self.path_for(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                shutil.copyfileobj(stream, f, CHUNK_SIZE)
+            os.chmod(temp_path, FILE_MODE)
+            os.replace(temp_path, path)
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def put_file(self, key, path, content_type=None):
+        destination = self.path_for(key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.chmod(path, FILE_MODE)
+        # Same filesystem as the ingest folder, so this is an atomic rename
+        os.replace(path, destination)
+
+    def open_range(self, key, start=0, end=None):
+        f = open(self.path_for(key), 'rb')
+        f.seek(start)
+        if end is None:
+            return f
+        return LimitedStream(f, end - start + 1)
+
+    def exists(self, key):
+        return os.path.exists(self.path_for(key))
+
+    def delete(self, key):
+        path = self.path_for(key)
+        if os.path.exists(path):
+            os.remove(path)
+
+    def move(self, src_key, dst_key):
+        destination = self.path_for(dst_key)
+        os.makedirs(os.path.dirname(destination), exist_ok=True)
+        os.rename(self.path_for(src_key), destination)
+
+    def url(self, key):
+        return url_for('uploaded_file', filename=self.key_for(key))
+
+
+class S3Storage(StorageBackend):
+    """Files in an S3-compatible bucket (AWS S3, MinIO, ...).
+
+    Needs boto3 (the s3 extra: `uv sync --extra s3`). One boto3 client is
+    shared by every request thread; its connection pool size is set by
+    S3_MAX_POOL_CONNECTIONS. Large files are uploaded and copied as multipart
+    transfers, and downloads are handed to the client as presigned URLs,
+    against which browsers issue their own Range requests.
+    """
+
+    def __init__(self, root, config):
+        super().__init__(root)
+        import boto3
+        from botocore.config import Config
+        from boto3.s3.transfer import TransferConfig
+
+        self.bucket = config['S3_BUCKET']
+        self.url_expiry = config.get('S3_URL_EXPIRY', 3600)
+        self.client = boto3.client(
+            's3',
+            endpoint_url=config.get('S3_ENDPOINT_URL'),
+            aws_access_key_id=config.get('S3_ACCESS_KEY'),
+            aws_secret_access_key=config.get('S3_SECRET_KEY'),
+            region_name=config.get('S3_REGION', 'us-east-1'),
+            config=Config(
+                max_pool_connections=config.get('S3_MAX_POOL_CONNECTIONS', 20),
+                # MinIO-style stand-ins are usually addressed by path, not subdomain
+                s3={'addressing_style': 'path'},
+                retries={'max_attempts': 3, 'mode': 'standard'}
+            )
+        )
+        self.transfer_config = TransferConfig(
+            multipart_threshold=CHUNK_SIZE,
+            multipart_chunksize=CHUNK_SIZE,
+            max_concurrency=4
+        )
+
+    def _extra_args(self, content_type):
+        return {'ContentType': content_type} if content_type else None
+
+    def put_stream(self, key, stream, content_type=None):
+        self.client.upload_fileobj(
+            stream, self.bucket, self.key_for(key),
+            ExtraArgs=self._extra_args(content_type), Config=self.transfer_config
+        )
+
+    def put_file(self, key, path, content_type=None):
+        self.client.upload_file(
+            path, self.bucket, self.key_for(key),
+            ExtraArgs=self._extra_args(content_type), Config=self.transfer_config
+        )
+        os.remove(path)
+
+    def open_range(self, key, start=0, end=None):
+        byte_range = f"bytes={start}-{'' if end is None else end}"
+        response = self.client.get_object(Bucket=self.bucket, Key=self.key_for(key), Range=byte_range)
+        return response['Body']
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.key_for(key))
+            return True
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.key_for(key))
+
+    def move(self, src_key, dst_key):
+        # S3 has no rename - copy (multipart for large objects) then delete
+        self.client.copy(
+            {'Bucket': self.bucket, 'Key': self.key_for(src_key)},
+            self.bucket, self.key_for(dst_key), Config=self.transfer_config
+        )
+        self.delete(src_key)
+
+    def url(self, key):
+        return self.client.generate_presigned_url(
+            'get_object',
+            Params={'Bucket': self.bucket, 'Key': self.key_for(key)},
+            ExpiresIn=self.url_expiry
+        )
+
+
+def create_storage(config):
+    """Build the storage backend named by STORAGE_BACKEND ('local' or 's3')"""
+    backend = config.get('STORAGE_BACKEND', 'local')
+    if backend == 'local':
+        return LocalStorage(config['UPLOAD_FOLDER'])
+    if backend == 's3':
+        return S3Storage(config['UPLOAD_FOLDER'], config)
+    raise ValueError(f'Unknown storage backend: {backend}')
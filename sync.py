@@ -0,0 +1,179 @@
+from datetime import datetime
+from sqlalchemy import event, func
+from sqlalchemy import select as sql_select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import object_session
+from models import db, UserProgress, CourseSubmission, ArchivedProgress, ArchivedSubmission, SyncCursor, SyncTombstone
+from serializers import select, rows
+from archive import progress_rows, submission_rows
+
+# Synced row kinds: model, API projection, list order and the full list (hot and archived rows)
+SYNC_KINDS = {
+    'progress': (UserProgress, 'progress', UserProgress.completed_at, progress_rows),
+    'submission': (CourseSubmission, 'submission', CourseSubmission.submitted_at.desc(), submission_rows),
+}
+
+# Tombstones older than this are pruned by archive_data.py prune-tombstones
+TOMBSTONE_RETENTION_DAYS = 90
+
+cursors = SyncCursor.__table__
+tombstones = SyncTombstone.__table__
+
+# Dialects whose INSERT supports ON CONFLICT DO UPDATE
+UPSERT_DIALECTS = {
+    'postgresql': postgresql,
+    'sqlite': sqlite,
+}
+
+
+def advance_cursors(connection, user_ids):
+    """Advance the sync cursor of each user by one.
+
+    Updating the cursor row locks it until the transaction ends, so one
+    user's changes commit in cursor order: once a client has read cursor N,
+    no change numbered N or lower can still appear.
+    """
+    # Sorted so concurrent batches lock cursors in the same order
+    user_ids = sorted(set(user_ids))
+    if not user_ids:
+        return
+    statement = UPSERT_DIALECTS[connection.dialect.name].insert(cursors).values(
+        [{'user_id': user_id, 'seq': 1, 'floor': 0} for user_id in user_ids]
+    )
+    connection.execute(statement.on_conflict_do_update(
+        index_elements=['user_id'], set_={'seq': cursors.c.seq + 1}
+    ))
+
+
+def cursor_value(user_id_column):
+    """Correlated subquery for a row owner's cursor, for set-based updates"""
+    return sql_select(cursors.c.seq).where(cursors.c.user_id == user_id_column).scalar_subquery()
+
+
+def current_cursor(user_id, connection=None):
+    connection = connection or db.session
+    seq = connection.execute(sql_select(cursors.c.seq).where(cursors.c.user_id == user_id)).scalar()
+    return seq or 0
+
+
+def prune_tombstones(before):
+    """Delete tombstones recorded before the cutoff. Returns how many were removed.
+
+    Each affected user's floor is raised to the newest pruned seq, so a
+    client still holding an older cursor gets the full list instead of a
+    delta that silently misses those deletions.
+    """
+    floors = db.session.query(SyncTombstone.user_id, func.max(SyncTombstone.seq)).filter(
+        SyncTombstone.deleted_at < before
+    ).group_by(SyncTombstone.user_id).all()
+    for user_id, seq in floors:
+        db.session.execute(cursors.update().where(
+            cursors.c.user_id == user_id, cursors.c.floor < seq
+        ).values(floor=seq))
+    pruned = SyncTombstone.query.filter(SyncTombstone.deleted_at < before).delete(synchronize_session=False)
+    db.session.commit()
+    return pruned
+
+
+def record_deletions(connection, kind, deleted):
+    """Leave tombstones for removed rows, given as (row_id, user_id, course_id)"""
+    if not deleted:
+        return
+    advance_cursors(connection, [user_id for _, user_id, _ in deleted])
+    seqs = dict(connection.execute(
+        sql_select(cursors.c.user_id, cursors.c.seq).where(
+            cursors.c.user_id.in_({user_id for _, user_id, _ in deleted})
+        )
+    ).all())
+    connection.execute(tombstones.insert(), [
+        {'user_id': user_id, 'kind': kind, 'row_id': row_id, 'course_id': course_id, 'seq': seqs[user_id]}
+        for row_id, user_id, course_id in deleted
+    ])
+
+
+def _stamp_change(mapper, connection, target):
+    advance_cursors(connection, [target.user_id])
+    target.change_seq = current_cursor(target.user_id, connection)
+
+
+def _stamp_update(mapper, connection, target):
+    # before_update also fires for objects that were touched without changing
+    if object_session(target).is_modified(target, include_collections=False):
+        _stamp_change(mapper, connection, target)
+
+
+def _tombstone_listener(kind):
+    def record(mapper, connection, target):
+        record_deletions(connection, kind, [(target.id, target.user_id, target.course_id)])
+    return record
+
+
+# ORM writes - including cascaded deletes such as delete_course_file() -
+# are tracked here; set-based statements call the helpers above themselves
+for _kind, (_model, _, _, _) in SYNC_KINDS.items():
+    event.listen(_model, 'before_insert', _stamp_change)
+    event.listen(_model, 'before_update', _stamp_update)
+    event.listen(_model, 'after_delete', _tombstone_listener(_kind))
+
+
+def sync_delta(kind, user_id, since):
+    """Rows of one kind changed after the since cursor, and ids of rows removed after it.
+
+    since=0, a cursor from the future or one older than the pruned
+    tombstones returns the full list - archived rows included - with
+    full=True. Archiving is not a change: archived rows are neither sent
+    again nor reported as deleted.
+    """
+    model, projection, order, full_list = SYNC_KINDS[kind]
+    # Read the cursor before the rows: a change committed in between is
+    # numbered above it and is simply sent again on the next call
+    state = db.session.execute(
+        sql_select(cursors.c.seq, cursors.c.floor).where(cursors.c.user_id == user_id)
+    ).first()
+    cursor, floor = state or (0, 0)
+    if since <= 0 or since > cursor or since < floor:
+        return {'cursor': cursor, 'full': True, 'changed': full_list(user_id), 'deleted': []}
+
+    changed = select(projection).filter(model.user_id == user_id, model.change_seq > since)
+    deleted = [row_id for (row_id,) in db.session.query(SyncTombstone.row_id).filter(
+        SyncTombstone.user_id == user_id,
+        SyncTombstone.kind == kind,
+        SyncTombstone.seq > since
+    )]
+
+    return {
+        'cursor': cursor,
+        'full': False,
+        'changed': rows(changed.order_by(order)),
+        'deleted': deleted
+    }
+
+
+def sync_summary(kind, user_id):
+    """Per-course counts for one kind, small enough to poll. Archived rows are counted too"""
+    # completion.py imports this module
+    from completion import completion_counts
+
+    cursor = current_cursor(user_id)
+    courses = {}
+    if kind == 'progress':
+        last_completed = dict(db.session.query(
+            UserProgress.course_id, func.max(UserProgress.completed_at)
+        ).filter(UserProgress.user_id == user_id).group_by(UserProgress.course_id))
+        for archived in ArchivedProgress.query.filter_by(user_id=user_id):
+            newest = max(datetime.fromisoformat(completed_at) for _, completed_at, _ in archived.completions)
+            if archived.course_id not in last_completed or newest > last_completed[archived.course_id]:
+                last_completed[archived.course_id] = newest
+        for course_id, completed in completion_counts(user_id).items():
+            if completed:
+                courses[course_id] = {'completed': completed, 'last_completed_at': last_completed.get(course_id)}
+    else:
+        for model in (CourseSubmission, ArchivedSubmission):
+            query = db.session.query(
+                model.course_id, model.status, func.count(model.id)
+            ).filter(model.user_id == user_id).group_by(model.course_id, model.status)
+            for course_id, status, count in query:
+                statuses = courses.setdefault(course_id, {})
+                statuses[status] = statuses.get(status, 0) + count
+
+    return {'cursor': cursor, 'courses': courses}
@@ -0,0 +1,239 @@
+import hashlib
+import os
+import tempfile
+from functools import wraps
+from flask import Request, current_app, request
+
+# Allowed extensions grouped by the size-limit category they fall under
+EXTENSION_CATEGORIES = {
+    'pdf': 'document', 'doc': 'document', 'docx': 'document',
+    'ppt': 'document', 'pptx': 'document', 'txt': 'document',
+    'mp3': 'audio', 'wav': 'audio', 'ogg': 'audio', 'aac': 'audio', 'm4a': 'audio',
+    'mp4': 'video', 'avi': 'video', 'mov': 'video', 'mkv': 'video', 'webm': 'video',
+    'jpg': 'image', 'jpeg': 'image', 'png': 'image', 'gif': 'image', 'bmp': 'image'
+}
+
+# Enough leading bytes to recognise every supported format
+SNIFF_SIZE = 512
+
+OLE_MAGIC = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+ZIP_MAGIC = b'PK\x03\x04'
+
+
+def _is_mp3(head):
+    return head.startswith(b'ID3') or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0)
+
+
+def _is_aac(head):
+    return head.startswith(b'ADIF') or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xF6 == 0xF0)
+
+
+def _is_iso_media(head):
+    return head[4:8] == b'ftyp'
+
+
+def _is_riff(form_type):
+    return lambda head: head.startswith(b'RIFF') and head[8:12] == form_type
+
+
+def _is_text(head):
+    return b'\x00' not in head
+
+
+MAGIC_CHECKS = {
+    'pdf': lambda head: head.startswith(b'%PDF'),
+    'doc': lambda head: head.startswith(OLE_MAGIC),
+    'ppt': lambda head: head.startswith(OLE_MAGIC),
+    'docx': lambda head: head.startswith(ZIP_MAGIC),
+    'pptx': lambda head: head.startswith(ZIP_MAGIC),
+    'txt': _is_text,
+    'mp3': _is_mp3,
+    'wav': _is_riff(b'WAVE'),
+    'ogg': lambda head: head.startswith(b'OggS'),
+    'aac': _is_aac,
+    'm4a': _is_iso_media,
+    'mp4': _is_iso_media,
+    'mov': _is_iso_media,
+    'avi': _is_riff(b'AVI '),
+    'mkv': lambda head: head.startswith(b'\x1a\x45\xdf\xa3'),
+    'webm': lambda head: head.startswith(b'\x1a\x45\xdf\xa3'),
+    'jpg': lambda head: head.startswith(b'\xff\xd8\xff'),
+    'jpeg': lambda head: head.startswith(b'\xff\xd8\xff'),
+    'png': lambda head: head.startswith(b'\x89PNG\r\n\x1a\n'),
+    'gif': lambda head: head.startswith((b'GIF87a', b'GIF89a')),
+    'bmp': lambda head: head.startswith(b'BM'),
+}
+
+
+class UploadRejected(Exception):
+    """Raised while the request body is being read if an upload is not acceptable"""
+
+    def __init__(self, message, status_code=400):
+        super().__init__(message)
+        self.message = message
+        self.status_code = status_code
+
+
+def get_extension(filename):
+    return filename.rsplit('.', 1)[1].lower() if filename and '.' in filename else ''
+
+
+class IngestFile:
+    """Write target for one uploaded file.
+
+    Werkzeug writes the multipart body into this object chunk by chunk. Each
+    chunk is size-checked, hashed and written to a temporary file next to the
+    upload folder exactly once; the leading bytes are checked against the
+    extension's magic number as soon as they arrive. commit() hands the temp
+    file to the storage backend, which for local storage is an atomic rename.
+    """
+
+    def __init__(self, directory, filename, allowed_extensions, size_limits):
+        self.filename = filename
+        self.extension = get_extension(filename)
+        if self.extension not in allowed_extensions:
+            raise UploadRejected('Invalid file type')
+
+        self.max_size = size_limits[EXTENSION_CATEGORIES[self.extension]]
+        self.size = 0
+        self.checksum = None
+        self._hash = hashlib.sha256()
+        self._head = b''
+        self._sniffed = False
+        self._committed = False
+
+        os.makedirs(directory, exist_ok=True)
+        fd, self.temp_path = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        self._file = os.fdopen(fd, 'w+b')
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_size:
+            self.close()
+            raise UploadRejected(
+                f'File too large. Maximum size for {self.extension.upper()} files is {self.max_size // (1024 * 1024)}MB',
+                413
+            )
+
+        if not self._sniffed:
+            self._head += data[:SNIFF_SIZE - len(self._head)]
+            if len(self._head) >= SNIFF_SIZE:
+                self._sniff()
+
+        self._hash.update(data)
+        self._file.write(data)
+        return len(data)
+
+    def _sniff(self):
+        self._sniffed = True
+        if not MAGIC_CHECKS[self.extension](self._head):
+            self.close()
+            raise UploadRejected('File contents do not match its extension')
+
+    # File-like methods Werkzeug expects from a stream factory result
+    def seek(self, offset, whence=0):
+        return self._file.seek(offset, whence)
+
+    def tell(self):
+        return self._file.tell()
+
+    def read(self, size=-1):
+        return self._file.read(size)
+
+    def readline(self, size=-1):
+        return self._file.readline(size)
+
+    def commit(self, storage, key, content_type=None):
+        """Hand the fully received upload to the storage backend under key"""
+        if not self._sniffed:
+            self._sniff()
+        if self.size == 0:
+            self.close()
+            raise UploadRejected('Uploaded file is empty')
+
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        storage.put_file(key, self.temp_path, content_type)
+        self._committed = True
+        self.checksum = self._hash.hexdigest()
+        return key
+
+    def close(self):
+        # An upload that was never committed leaves nothing behind
+        if not self._file.closed:
+            self._file.close()
+        if not self._committed and os.path.exists(self.temp_path):
+            os.remove(self.temp_path)
+
+
+def upload_request_limit(app):
+    """Request size cap on streamed_upload endpoints: the largest file allowed plus room for the form"""
+    return max(app.config['UPLOAD_SIZE_LIMITS'].values()) + 1024 * 1024
+
+
+def open_ingest(app, filename, allowed_extensions):
+    return IngestFile(
+        os.path.join(app.config['UPLOAD_FOLDER'], '.incoming'),
+        filename,
+        allowed_extensions,
+        app.config['UPLOAD_SIZE_LIMITS']
+    )
+
+
+# Set by the ASGI server (asgi.py) when it has already read the multipart body:
+# either a (form, files) pair or the UploadRejected raised while reading it
+PREPARSED_FORM_KEY = 'seedsowers.preparsed_form'
+
+
+class UploadRequest(Request):
+    """Request class that streams uploads through IngestFile on opted-in endpoints"""
+
+    upload_extensions = None
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        # An empty file input has no filename; the view reports it as no file selected
+        if self.upload_extensions is None or not filename:
+            return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+        return open_ingest(current_app, filename, self.upload_extensions)
+
+    def _load_form_data(self):
+        preparsed = self.environ.get(PREPARSED_FORM_KEY)
+        if preparsed is None or 'form' in self.__dict__:
+            return super()._load_form_data()
+        if isinstance(preparsed, UploadRejected):
+            raise preparsed
+
+        d = self.__dict__
+        d['form'], d['files'] = preparsed
+
+
+def load_upload_form():
+    """Read the form and files of a streamed_upload request.
+
+    Returns (form, files); raises UploadRejected if an upload was not acceptable.
+    """
+    return request.form, request.files
+
+
+def streamed_upload(allowed_extensions, roles=None):
+    """Stream file parts of this endpoint's request body through IngestFile.
+
+    Must run before the view touches request.form or request.files; views
+    read them with load_upload_form(). The request may be up to
+    upload_request_limit() instead of MAX_CONTENT_LENGTH. roles lists the user roles allowed to
+    upload here (None: any logged-in user); the view still checks them, this
+    lets the ASGI server refuse other users before reading the body.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            request.upload_extensions = allowed_extensions
+            request.max_content_length = upload_request_limit(current_app)
+            return view(*args, **kwargs)
+        # Lets the ASGI server find streamed endpoints (copied onto outer decorators by wraps)
+        wrapper.upload_extensions = allowed_extensions
+        wrapper.upload_roles = roles
+        return wrapper
+    return decorator